@@ -1,2 +1,3 @@
 from . import companies
-from . import poopy 
\ No newline at end of file
+from . import poopy
+from . import store
@@ -1,11 +1,124 @@
+import asyncio
 import datetime
+import hashlib
+import json
+import os
+import random
 import requests
+import time
 import warnings
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from poopy.poopy import Discharge, Event, Monitor, NoDischarge, Offline, WaterCompany
+from poopy.poopy import (
+    Discharge,
+    Event,
+    EVENT_CLASSES,
+    EVENT_TYPE_CODES,
+    MONITOR_ATTRIBUTE_COLUMNS,
+    ONGOING,
+    EventColumns,
+    History,
+    Monitor,
+    NoDischarge,
+    Offline,
+    WaterCompany,
+    to_epoch,
+)
+from poopy.store import AlertStore, CrawlCheckpoint, cache_dir
+
+# Integer codes for the types of alert in an alert stream (0 is reserved for unrecognised alert types)
+ALERT_TYPE_CODES = {"Start": 1, "Stop": 2, "Offline start": 3, "Offline stop": 4}
+# The kinds of anomaly (i.e., invalid alert) in an alert stream, accessed by the codes returned by
+# `alert_stream_to_intervals` (0 is reserved for valid alerts)
+ANOMALY_TYPES = {
+    1: "Stop not preceded by Start",
+    2: "Offline stop not preceded by Offline start",
+    3: "Start preceded by Start",
+    4: "Oldest alert not a Start",
+}
+
+
+def alert_type_codes(alert_types: pd.Series) -> np.ndarray:
+    """
+    Converts a series of alert types (e.g., "Start", "Offline stop") to an array of integer codes (see
+    `ALERT_TYPE_CODES`). Unrecognised and missing alert types are given the code 0.
+
+    Args:
+        alert_types: A series of alert types, either categorical or of strings.
+
+    Returns:
+        An array of alert type codes.
+    """
+    if not isinstance(alert_types.dtype, pd.CategoricalDtype):
+        alert_types = alert_types.astype("category")
+    categories = alert_types.cat.categories
+    # The last entry of the lookup table is the code for missing values, which have a categorical code of -1
+    lookup = np.array(
+        [ALERT_TYPE_CODES.get(category, 0) for category in categories] + [0],
+        dtype=np.uint8,
+    )
+    return lookup[alert_types.cat.codes.to_numpy()]
+
+
+def alert_stream_to_intervals(
+    codes: np.ndarray, times: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs the consecutive alerts of the alert stream of a single monitor into the intervals of its (past) events.
+    The alert stream must be ordered newest first, so each alert is paired with the alert that precedes it in time,
+    i.e., the next row. Pairs are classified as follows:
+
+    - a Stop preceded by a Start is a discharge,
+    - an Offline stop preceded by an Offline start is an offline period,
+    - a Start or Offline start preceded by anything other than a Start or Offline start is a period of no discharge.
+
+    A Stop (or Offline stop) not preceded by a Start (or Offline start), a Start or Offline start preceded by another
+    Start or Offline start, and a final (oldest) alert that is not a Start or Offline start are anomalies (see
+    `ANOMALY_TYPES`), which are skipped.
+
+    Args:
+        codes: The alert type codes of the alerts (see `alert_type_codes`), newest first.
+        times: The datetimes of the alerts, newest first.
+
+    Returns:
+        A tuple of the start times, end times and kinds of the events (newest first), and the anomaly code of each
+        alert (0 for valid alerts). Kinds are event type codes (see `poopy.poopy.EVENT_TYPE_CODES`), i.e., 0 for a
+        discharge, 1 for offline and 2 for no discharge.
+    """
+    codes = np.asarray(codes)
+    times = np.asarray(times)
+    anomalies = np.zeros(len(codes), dtype=np.uint8)
+    if len(codes) == 0:
+        return times[:0], times[:0], np.zeros(0, dtype=np.uint8), anomalies
+
+    is_start = (codes == ALERT_TYPE_CODES["Start"]) | (
+        codes == ALERT_TYPE_CODES["Offline start"]
+    )
+    # Compare each alert (but the oldest) with the alert preceding it in time
+    alert, preceding = codes[:-1], codes[1:]
+    is_stop = alert == ALERT_TYPE_CODES["Stop"]
+    is_offline_stop = alert == ALERT_TYPE_CODES["Offline stop"]
+    discharge = is_stop & (preceding == ALERT_TYPE_CODES["Start"])
+    offline = is_offline_stop & (preceding == ALERT_TYPE_CODES["Offline start"])
+    no_discharge = is_start[:-1] & ~is_start[1:]
+
+    anomalies[:-1][is_stop & ~discharge] = 1
+    anomalies[:-1][is_offline_stop & ~offline] = 2
+    anomalies[:-1][is_start[:-1] & is_start[1:]] = 3
+    if not is_start[-1]:
+        anomalies[-1] = 4
+
+    kinds = np.full(len(alert), -1, dtype=np.int8)
+    kinds[discharge] = 0
+    kinds[offline] = 1
+    kinds[no_discharge] = 2
+    index = np.flatnonzero(kinds >= 0)
+    return times[index + 1], times[index], kinds[index].astype(np.uint8), anomalies
 
 
 class ThamesWater(WaterCompany):
@@ -13,10 +126,21 @@ class ThamesWater(WaterCompany):
     A subclass of `WaterCompany` that represents the EDM monitoring network for Thames Water.
     """
 
+    # The name of the company, which also names its files in the cache (e.g., the alert store)
+    NAME = "ThamesWater"
     API_ROOT = "https://prod-tw-opendata-app.uk-e1.cloudhub.io"
     CURRENT_API_RESOURCE = "/data/STE/v1/DischargeCurrentStatus"
     HISTORICAL_API_RESOURCE = "/data/STE/v1/DischargeAlerts"
     API_LIMIT = 1000  # Max num of outputs that can be requested from the API at once
+    # Columns of the API responses that are parsed as datetimes and as categoricals, respectively
+    DATETIME_COLUMNS = ["DateTime", "StatusChange"]
+    CATEGORICAL_COLUMNS = ["LocationName", "AlertType"]
+    # Failed page requests are retried up to MAX_RETRIES times, waiting a random time (jitter) of up to
+    # RETRY_BACKOFF * 2 ** attempt seconds (capped at RETRY_MAX_DELAY seconds) before each retry
+    MAX_RETRIES = 5
+    RETRY_BACKOFF = 1.0
+    RETRY_MAX_DELAY = 60.0
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
     # Set history valid until to be half past midnight on the 1st April 2022
     HISTORY_VALID_UNTIL = datetime.datetime(2022, 4, 1, 0, 30, 0)
@@ -31,35 +155,323 @@ class ThamesWater(WaterCompany):
     D8_FILE_URL = "https://zenodo.org/records/10426423/files/thames_d8.nc?download=1"
     D8_FILE_HASH = "md5:1047a14906237cd436fd483e87c1647d"
 
-    def __init__(self, clientID: str, clientSecret: str):
+    def __init__(
+        self,
+        clientID: str,
+        clientSecret: str,
+        max_workers: int = 1,
+        pool_size: int = 10,
+        timeout: float = 30.0,
+        session: Optional[requests.Session] = None,
+        cache_history: bool = False,
+        checkpoint_history: bool = False,
+        columnar_history: bool = False,
+        history_processes: int = 1,
+    ):
+        """
+        Args:
+            clientID: The client ID for the Thames Water API.
+            clientSecret: The client secret for the Thames Water API.
+            max_workers: The maximum number of API pages to request concurrently when paginating. Defaults to 1,
+                which requests pages one at a time.
+            pool_size: The maximum number of connections kept alive in the HTTP connection pool. Should be at least
+                `max_workers`. Defaults to 10.
+            timeout: The timeout in seconds for each API request. Defaults to 30.
+            session: An existing `requests.Session` to send requests through (e.g., shared between companies).
+                Defaults to None, in which case a new pooled session is created.
+            cache_history: Whether to persist the alert stream to an on-disk store (see `poopy.store.AlertStore`),
+                which incremental calls of `set_all_histories` (and `Monitor.get_history`) read from first,
+                requesting only newer alerts from the API. Defaults to False.
+            checkpoint_history: Whether to checkpoint the pages of history crawls to disk as they are fetched (see
+                `poopy.store.CrawlCheckpoint`), so that a crawl interrupted by a failure resumes from the last page
+                fetched successfully. Defaults to False.
+            columnar_history: Whether `set_all_histories` stores histories as columns (see `poopy.poopy.EventColumns`),
+                creating Event objects only as they are accessed. Defaults to False.
+            history_processes: The number of processes across which `set_all_histories` distributes building the
+                histories of monitors. Defaults to 1, which builds histories in this process.
+        """
         print("\033[36m" + "Initialising Thames Water object..." + "\033[0m")
-        super().__init__(clientID, clientSecret)
-        self._name = "ThamesWater"
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if history_processes < 1:
+            raise ValueError("history_processes must be at least 1.")
+        self._max_workers = max_workers
+        self._history_processes = history_processes
+        self._checkpoint_history = checkpoint_history
+        self._alerts_df: pd.DataFrame = None
+        self._alerts_synced_until: datetime.datetime = None
+        super().__init__(
+            clientID,
+            clientSecret,
+            pool_size=pool_size,
+            timeout=timeout,
+            session=session,
+            columnar_history=columnar_history,
+        )
+        self._name = self.NAME
+        if cache_history:
+            self._alert_store = AlertStore(
+                company_name=self._name,
+                valid_until=self.HISTORY_VALID_UNTIL,
+                api_root=self.API_ROOT,
+            )
         self._d8_file_path = self._fetch_d8_file(
             url=self.D8_FILE_URL,
             known_hash=self.D8_FILE_HASH,
         )
 
-    def set_all_histories(self) -> None:
+    def set_all_histories(self, incremental: bool = False) -> None:
         """
         Sets the historical data for all active monitors and store it in the history attribute of each monitor.
+
+        Args:
+            incremental: If True, and histories have been set before, only alerts newer than the newest alert already
+                ingested are requested from the API (which returns alerts newest first, so the crawl stops as soon as it
+                reaches known data). The new alerts are merged into the stored alert stream and histories are rebuilt
+                (in place) only for monitors that received new alerts or have no history yet. If the alert stream is
+                cached on disk, it is loaded from the store first, so this also resumes from the store after a
+                restart. Defaults to False, which re-downloads the entire alert stream (and, if it is cached on disk,
+                clears and rebuilds the store).
+        """
+        since = self._start_history_sync(incremental)
+        fetched_df = self._get_all_monitors_history_df(since=since)
+        self._set_histories_from_alerts(fetched_df, since)
+
+    async def set_all_histories_async(self, incremental: bool = False) -> None:
+        """
+        Awaitable version of `set_all_histories`. Pages of the alert stream are requested concurrently (up to
+        `max_workers` at once) without blocking the event loop (see `_handle_history_api_response_async`), and the
+        alert store and histories are then updated in a worker thread.
+
+        Args:
+            incremental: If True, only fetch alerts newer than those already ingested and update histories in place.
+        """
+        since = await asyncio.to_thread(self._start_history_sync, incremental)
+        fetched_df = await self._get_all_monitors_history_df_async(since=since)
+        await asyncio.to_thread(self._set_histories_from_alerts, fetched_df, since)
+
+    def _start_history_sync(self, incremental: bool) -> Optional[datetime.datetime]:
+        """
+        Starts a sync of the alert stream (see `set_all_histories`), loading the alert store if needed. Returns the
+        datetime of the newest alert already ingested if the sync is incremental, or None if the entire alert stream
+        is to be downloaded.
         """
         self._history_timestamp = datetime.datetime.now()
-        df = self._get_all_monitors_history_df()
+        if incremental and self._alert_store is not None and self._alerts_df is None:
+            self._load_alert_store()
+        if incremental:
+            return self._alerts_synced_until
+        return None
+
+    def _set_histories_from_alerts(
+        self, fetched_df: pd.DataFrame, since: Optional[datetime.datetime]
+    ) -> None:
+        """
+        Merges the alerts fetched from the API into the stored alert stream (and the alert store), then builds the
+        histories of the monitors (see `set_all_histories`).
+
+        Args:
+            fetched_df: The alerts fetched from the API.
+            since: The datetime of the newest alert already ingested if only newer alerts were fetched, or None if
+                the entire alert stream was fetched.
+        """
+        if since is not None:
+            new_df = self._new_alerts(old_df=self._alerts_df, new_df=fetched_df)
+            print(
+                "\033[36m"
+                + "\tFound {0} new alert(s) since {1}".format(new_df.shape[0], since)
+                + "\033[0m"
+            )
+            df = self._concat_alerts([new_df, self._alerts_df])
+            updated_names = set(new_df["LocationName"].unique().tolist())
+        else:
+            df = new_df = fetched_df
+            updated_names = None
+            if self._alert_store is not None:
+                # The store is rebuilt from the re-downloaded alert stream
+                self._alert_store.clear()
+        self._alerts_df = df
+        if not df.empty:
+            self._alerts_synced_until = df["DateTime"].max()
+        if self._alert_store is not None:
+            self._alert_store.append(new_df)
+            self._alert_store.synced_until = self._alerts_synced_until
+
         historical_names = df["LocationName"].unique().tolist()
         # Find which monitors present in historical_names are not in active_names
         active_names = self.active_monitor_names
-        inactive_names = [x for x in historical_names if x not in active_names]
-        # If inactive is not empty raise a warning using the warnings module in red using ANSI escape codes
-        if inactive_names:
-            warnings.warn(
-                f"\033[31m\n! WARNING ! The following historical monitors are no longer active: {inactive_names}\nStoring historical data for inactive monitors is not currently supported!\nIf this message has appeared it should be implemented...\033[0m "
-            )
+        active_set = set(active_names)
+        inactive_names = [x for x in historical_names if x not in active_set]
         print("\033[36m" + f"Building history for monitors..." + "\033[0m")
+        alerts_by_location = self._split_by_location(df)
+        alert_streams = []
         for name in active_names:
-            subset = df[df["LocationName"] == name]
             monitor = self.active_monitors[name]
-            monitor._history = self._events_df_to_events_list(subset, monitor)
+            if (
+                updated_names is not None
+                and name not in updated_names
+                and monitor._history is not None
+            ):
+                # No new alerts for this monitor so its history is already up to date
+                continue
+            subset = alerts_by_location.get(name, df.iloc[:0])
+            alert_streams.append((monitor, subset))
+        # Monitors that are no longer active are archived as columns, rather than Monitor objects
+        inactive_streams = [(name, alerts_by_location[name]) for name in inactive_names]
+        if inactive_names:
+            print(
+                "\033[36m"
+                + f"\tArchiving history for {len(inactive_names)} monitor(s) that are no longer active..."
+                + "\033[0m"
+            )
+
+        names = [monitor.site_name for monitor, _ in alert_streams] + inactive_names
+        intervals, anomalies = self._build_intervals(
+            [(monitor.site_name, subset) for monitor, subset in alert_streams]
+            + inactive_streams
+        )
+        self._set_anomalies(names, anomalies)
+        for (monitor, _), monitor_intervals in zip(alert_streams, intervals):
+            if self._columnar_history:
+                monitor._history = self._intervals_to_history(
+                    monitor, monitor_intervals
+                )
+            elif not isinstance(monitor._history, list):
+                monitor._history = self._intervals_to_events(monitor, monitor_intervals)
+            else:
+                monitor._history[:] = self._intervals_to_events(
+                    monitor, monitor_intervals
+                )
+        self._archive_inactive_monitors(
+            inactive_streams, intervals[len(alert_streams) :]
+        )
+        self._interval_index_cache = {}
+        if self._timeseries_pyramid is not None:
+            self._timeseries_pyramid.extend()
+        if self._discharge_cube is not None:
+            self.build_discharge_cube(
+                include_inactive=self._discharge_cube.include_inactive,
+                path=self._discharge_cube.path,
+            )
+
+    def _archive_inactive_monitors(
+        self,
+        alert_streams: List[Tuple[str, pd.DataFrame]],
+        intervals: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ) -> None:
+        """
+        Stores the attributes and histories (as columns) of monitors that are in the alert stream but are no longer
+        active, so that they are included in network-wide statistics (see `WaterCompany.inactive_monitors`).
+
+        Args:
+            alert_streams: Pairs of the names of the inactive monitors and their (non-empty) alert streams.
+            intervals: The intervals of the events of each alert stream (see `_build_intervals`).
+        """
+        self._inactive_history_columns = EventColumns.concatenate(
+            [
+                self._intervals_to_columns(name, *monitor_intervals)
+                for (name, _), monitor_intervals in zip(alert_streams, intervals)
+            ]
+        )
+        # The attributes of each monitor are taken from its newest alert
+        self._inactive_monitors = pd.DataFrame(
+            [
+                {column: df[column].iloc[0] for column in MONITOR_ATTRIBUTE_COLUMNS}
+                for _, df in alert_streams
+            ],
+            columns=MONITOR_ATTRIBUTE_COLUMNS,
+        )
+
+    def _load_alert_store(self) -> None:
+        """
+        Loads the alert stream from the on-disk alert store, if the store holds a complete sync of the network.
+        """
+        synced_until = self._alert_store.synced_until
+        if synced_until is None:
+            return
+        print(
+            "\033[36m"
+            + "Loading stored alerts from {0}...".format(self._alert_store.path)
+            + "\033[0m"
+        )
+        self._alerts_df = self._set_dtypes(self._alert_store.load())
+        self._alerts_synced_until = synced_until
+
+    def _split_by_location(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Splits a dataframe of alerts into one dataframe per monitor in a single pass, rather than filtering the whole
+        dataframe once per monitor. The alerts are stably sorted by location (so each monitor keeps its alerts newest
+        first) and each monitor is given a slice of the sorted dataframe, which does not copy its rows.
+
+        Returns:
+            A dictionary mapping the location names of monitors to their alerts.
+        """
+        if df.empty:
+            return {}
+        locations = df["LocationName"]
+        if not isinstance(locations.dtype, pd.CategoricalDtype):
+            locations = locations.astype("category")
+        codes = locations.cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        sorted_df = df.iloc[order]
+        sorted_codes = codes[order]
+        # The boundaries between the contiguous blocks of rows of each location
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(sorted_codes)]))
+        categories = locations.cat.categories
+        return {
+            categories[sorted_codes[start]]: sorted_df.iloc[start:end]
+            for start, end in zip(starts, ends)
+            if sorted_codes[start] >= 0
+        }
+
+    def _new_alerts(self, old_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the alerts in `new_df` that are not in `old_df`. Alerts are identified by their location name,
+        datetime and alert type.
+        """
+        if old_df.empty or new_df.empty:
+            return new_df
+
+        def _hash(df: pd.DataFrame) -> pd.Series:
+            keys = df[["LocationName", "DateTime", "AlertType"]]
+            return pd.util.hash_pandas_object(keys, index=False)
+
+        is_new = ~_hash(new_df).isin(_hash(old_df))
+        return new_df[is_new.to_numpy()]
+
+    def _concat_alerts(self, dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Concatenates dataframes of alerts, keeping categorical columns categorical (concatenating categoricals
+        with different categories otherwise falls back to object columns).
+        """
+        df = pd.concat(dfs, ignore_index=True)
+        return self._set_dtypes(df)
+
+    def _records_to_df(self, records: List[dict]) -> pd.DataFrame:
+        """
+        Builds a single dataframe from the records of all pages of an API response, setting column dtypes
+        (see `_set_dtypes`) as it is constructed.
+        """
+        return self._set_dtypes(pd.json_normalize(records))
+
+    def _set_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parses the datetime columns of a dataframe of API records to datetime64, and stores repetitive string
+        columns (e.g., location names and alert types) as categoricals.
+        """
+        for column in self.DATETIME_COLUMNS:
+            if column in df.columns and not pd.api.types.is_datetime64_any_dtype(
+                df[column]
+            ):
+                df[column] = pd.to_datetime(df[column])
+        for column in self.CATEGORICAL_COLUMNS:
+            if column in df.columns and not isinstance(
+                df[column].dtype, pd.CategoricalDtype
+            ):
+                df[column] = df[column].astype("category")
+        return df
 
     def _get_current_status_df(self) -> pd.DataFrame:
         """
@@ -79,9 +491,33 @@ class ThamesWater(WaterCompany):
 
         return df
 
-    def _get_all_monitors_history_df(self) -> pd.DataFrame:
+    def _get_all_monitors_history_df(
+        self, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Get the historical status of all monitors by calling the API. If `since` is given, only pages of alerts
+        up to (and including) the first alert older than `since` are requested.
+        """
+        print(
+            "\033[36m"
+            + f"Requesting historical data for all monitors from Thames Water API..."
+            + "\033[0m"
+        )
+        url = self.API_ROOT + self.HISTORICAL_API_RESOURCE
+        params = {
+            "limit": self.API_LIMIT,
+            "offset": 0,
+        }
+        df = self._handle_history_api_response(url=url, params=params, since=since)
+        df.reset_index(drop=True, inplace=True)
+        return df
+
+    async def _get_all_monitors_history_df_async(
+        self, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
         """
-        Get the historical status of all monitors by calling the API.
+        Awaitable version of `_get_all_monitors_history_df`, which requests pages of alerts concurrently without
+        blocking the event loop. See `_handle_history_api_response_async`.
         """
         print(
             "\033[36m"
@@ -93,13 +529,18 @@ class ThamesWater(WaterCompany):
             "limit": self.API_LIMIT,
             "offset": 0,
         }
-        df = self._handle_history_api_response(url=url, params=params)
+        df = await self._handle_history_api_response_async(
+            url=url, params=params, since=since
+        )
         df.reset_index(drop=True, inplace=True)
         return df
 
-    def _get_monitor_events_df(self, monitor: Monitor) -> pd.DataFrame:
+    def _get_monitor_events_df(
+        self, monitor: Monitor, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
         """
-        Get the historical status of a particular monitor by calling the API.
+        Get the historical status of a particular monitor by calling the API. If `since` is given, only pages of
+        alerts up to (and including) the first alert older than `since` are requested.
         """
         print(
             "\033[36m"
@@ -114,152 +555,453 @@ class ThamesWater(WaterCompany):
             "operand_1": "eq",
             "value_1": monitor.site_name,
         }
-        df = self._handle_current_api_response(url=url, params=params)
+        df = self._handle_current_api_response(url=url, params=params, since=since)
         # Note, we use handle_current_api_response here because we want to try and fetch all records not just those up to a certain date. This 
         # is because individual monitors don't have the same "start" date and so the historical fetching criterion varies. However, this is 
         # not ideal because it means that if the API erroneously returns an empty dataframe in place of an error message, then the function will
         # return an empty dataframe. This is the fault of the API, not this code but it is something to be aware of, and needs to be fixed.
         return df
 
-    def _handle_current_api_response(self, url: str, params: str) -> pd.DataFrame:
+    def _fetch_page(self, url: str, params: dict) -> Optional[List[dict]]:
+        """
+        Requests a single page from the API. Returns the list of records in the page, or None if the API returned
+        no items. Transient failures (connection errors, timeouts and the status codes in `RETRY_STATUS_CODES`) are
+        retried with exponential backoff and jitter, up to `MAX_RETRIES` times. Raises an exception if the request
+        failed for any other reason, or if it still fails after retrying.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                r = self.session.get(
+                    url,
+                    headers={
+                        "client_id": self.clientID,
+                        "client_secret": self.clientSecret,
+                    },
+                    params=params,
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                print("\033[36m" + "\tRequesting from " + r.url + "\033[0m")
+                # check response status and use only valid requests
+                if r.status_code == 200:
+                    response = r.json()
+                    if "items" not in response:
+                        return None
+                    return response["items"]
+                error = Exception(
+                    "\tRequest failed with status code {0}, and error message: {1}".format(
+                        r.status_code, r.text
+                    )
+                )
+                if r.status_code not in self.RETRY_STATUS_CODES:
+                    raise error
+            if attempt < self.MAX_RETRIES:
+                self._wait_before_retry(attempt, reason=str(error))
+        raise error
+
+    def _wait_before_retry(self, attempt: int, reason: str) -> None:
+        """
+        Sleeps before retrying a failed request, for a random time of up to `RETRY_BACKOFF` * 2 ** attempt seconds
+        (capped at `RETRY_MAX_DELAY` seconds).
+        """
+        delay = random.uniform(
+            0, min(self.RETRY_MAX_DELAY, self.RETRY_BACKOFF * 2**attempt)
+        )
+        print(
+            "\033[33m"
+            + "\tRequest failed ({0}). Retrying in {1:.1f} seconds ({2}/{3})...".format(
+                reason.strip(), delay, attempt + 1, self.MAX_RETRIES
+            )
+            + "\033[0m"
+        )
+        time.sleep(delay)
+
+    def _handle_current_api_response(
+        self, url: str, params: dict, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
         """
         Creates and handles the response from the API. If the response is valid, return a dataframe of the response.
         Otherwise, raise an exception. This is a helper function for the `_get_current_status_df` and `_get_monitor_history_df` functions.
         Loops through the API calls until all the records are fetched.
+
+        If the object was created with `max_workers` > 1, up to that many pages (at successive offsets) are requested
+        concurrently. Pages are reassembled in offset order, and any pages requested beyond the first page that
+        returned no items are discarded.
+
+        If `since` is given, records are assumed to be alerts ordered newest first, and the loop stops after the first
+        page containing a record older than `since`.
         """
-        df = pd.DataFrame()
-        while True:
-            r = requests.get(
-                url,
-                headers={
-                    "client_id": self.clientID,
-                    "client_secret": self.clientSecret,
-                },
-                params=params,
+        if self._max_workers > 1:
+            pages = self._fetch_pages_concurrently(url=url, params=params, since=since)
+        else:
+            pages = []
+            while True:
+                items = self._fetch_page(url, params)
+                if items is None:
+                    break
+                pages.append(items)
+                if self._page_reaches(items, since):
+                    break
+                params["offset"] += params["limit"]  # Increment offset for the next request
+        print("\033[36m" + "\tNo more records to fetch" + "\033[0m")
+        return self._records_to_df([record for items in pages for record in items])
+
+    def _page_reaches(
+        self, items: List[dict], since: Optional[datetime.datetime]
+    ) -> bool:
+        """
+        Returns whether a page of alerts (ordered newest first) reaches back to before `since`.
+        """
+        return since is not None and pd.to_datetime(items[-1]["DateTime"]) < since
+
+    def _fetch_pages_concurrently(
+        self, url: str, params: dict, since: Optional[datetime.datetime] = None
+    ) -> List[List[dict]]:
+        """
+        Requests successive pages of the API using a pool of `max_workers` threads, keeping that many requests in
+        flight at once. Returns the pages (lists of records) in offset order, stopping at the first page that
+        contains no items (or, if `since` is given, after the first page containing an alert older than `since`).
+        """
+        pages = []
+        next_offset = params["offset"]
+
+        def _submit(executor: ThreadPoolExecutor):
+            nonlocal next_offset
+            page_params = dict(params, offset=next_offset)
+            next_offset += params["limit"]
+            return executor.submit(self._fetch_page, url, page_params)
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            in_flight = deque(_submit(executor) for _ in range(self._max_workers))
+            while in_flight:
+                # Futures are consumed in the order they were submitted, i.e., in offset order
+                items = in_flight.popleft().result()
+                if items is None or self._page_reaches(items, since):
+                    if items is not None:
+                        pages.append(items)
+                    # Past the last record required, so any pages still in flight are not needed
+                    for future in in_flight:
+                        future.cancel()
+                    break
+                pages.append(items)
+                in_flight.append(_submit(executor))
+        return pages
+
+    async def _fetch_pages_async(
+        self, url: str, params: dict, since: Optional[datetime.datetime] = None
+    ) -> List[List[dict]]:
+        """
+        Awaitable version of `_fetch_pages_concurrently`. Keeps up to `max_workers` page requests in flight, each
+        running in a worker thread so that the event loop is not blocked. Returns the pages in offset order, stopping
+        at the first page that contains no items (or, if `since` is given, after the first page containing an alert
+        older than `since`).
+        """
+        pages = []
+        next_offset = params["offset"]
+
+        def _submit() -> asyncio.Future:
+            nonlocal next_offset
+            page_params = dict(params, offset=next_offset)
+            next_offset += params["limit"]
+            return asyncio.ensure_future(
+                asyncio.to_thread(self._fetch_page, url, page_params)
             )
 
-            print("\033[36m" + "\tRequesting from " + r.url + "\033[0m")
-            # check response status and use only valid requests
-            if r.status_code == 200:
-                response = r.json()
-                # If no items are returned, return an empty dataframe
-                if "items" not in response:
-                    print("\033[36m" + "\tNo more records to fetch" + "\033[0m")
+        in_flight = deque(_submit() for _ in range(self._max_workers))
+        try:
+            while in_flight:
+                # Tasks are awaited in the order they were submitted, i.e., in offset order
+                items = await in_flight.popleft()
+                if items is None or self._page_reaches(items, since):
+                    if items is not None:
+                        pages.append(items)
                     break
-                else:
-                    df_temp = pd.json_normalize(response["items"])
-            else:
-                raise Exception(
-                    "\tRequest failed with status code {0}, and error message: {1}".format(
-                        r.status_code, r.json()
-                    )
-                )
-            df = pd.concat([df, df_temp])
-            params["offset"] += params["limit"]  # Increment offset for the next request
-        df.reset_index(drop=True, inplace=True)
-        return df
+                pages.append(items)
+                in_flight.append(_submit())
+        finally:
+            # Past the last record required (or failed), so any pages still in flight are not needed
+            for task in in_flight:
+                task.cancel()
+        return pages
 
-    def _handle_history_api_response(self, url: str, params: str) -> pd.DataFrame:
+    def _handle_history_api_response(
+        self, url: str, params: dict, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
         """
         Creates and handles the response from the API. If the response is valid, it returns a dataframe of the response.
         Otherwise, it raises an exception. The function loops through the API calls until a record is returned that has a datetime
         that exceeds the `HISTORY_VALID_UNTIL` date. This differs from the `handle_api_response` function in that it does not try
         to fetch all records, but only those until a certain date. This allows for more elegant handling of the error whereby the
-        API erroneously returns an empty dataframe in place of an error message. Note that there is one case where this function
-        will behave unexpectedly: if the number of records returned is exactly an integer multiple of the API limit number of events
-        (e.g., 0, 1000, 2000 etc.), then the function will return an empty dataframe. This is because the function cannot distinguish
-        between this case and the case where the API genuinely returns no records. This is the fault of the API, not this code but 
-        it is something to be aware of, and needs to be fixed.
+        API erroneously returns an empty dataframe in place of an error message. If the number of records is exactly an integer
+        multiple of the API limit (e.g., 1000, 2000 etc.), the last page is full and the next page returns no items. As the last
+        page already reaches back to before `HISTORY_VALID_UNTIL`, every record needed has been fetched, so the crawl ends
+        there rather than raising an exception (see `_reached_valid_until`). An empty page before that point is still an error.
+
+        If `since` is given (e.g., the datetime of the newest alert already ingested), the loop instead stops as soon as
+        a page contains a record older than `since`, as all later pages contain only older records.
+
+        Pages that return no items are retried (see `_fetch_page`) before raising the exception. If the object was
+        created with `checkpoint_history`, each page is checkpointed to disk as it is fetched, so that if the crawl
+        fails it resumes from the last page fetched successfully the next time it is run (see
+        `poopy.store.CrawlCheckpoint`).
 
         See also the `handle_current_api_response` function.
         """
+        checkpoint, records = self._start_history_crawl(
+            url=url, params=params, since=since
+        )
+        while True:
+            items = self._fetch_page(url, params)
+            for attempt in range(self.MAX_RETRIES):
+                if items is not None or self._reached_valid_until(records):
+                    break
+                # An empty page is most likely the API erroneously returning no items in place of an error
+                self._wait_before_retry(attempt, reason="API returned no items")
+                items = self._fetch_page(url, params)
+            if items is None:
+                if self._reached_valid_until(records):
+                    print("\033[36m" + "\tNo more records to fetch!" + "\033[0m")
+                    break
+                raise self._empty_history_page_error(url, params, len(records))
+            if checkpoint is not None:
+                checkpoint.append(offset=params["offset"], items=items)
+            records.extend(items)
+            if self._is_last_history_page(items, since):
+                break
+            params["offset"] += params["limit"]  # Increment offset for the next request
+        return self._finish_history_crawl(records, checkpoint)
+
+    async def _handle_history_api_response_async(
+        self, url: str, params: dict, since: Optional[datetime.datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Awaitable version of `_handle_history_api_response`. Up to `max_workers` pages (at successive offsets) are
+        requested concurrently, each in a worker thread so that the event loop is not blocked. Pages are consumed in
+        offset order, so the crawl stops at the same page as `_handle_history_api_response` (any pages still in flight
+        are cancelled), pages that return no items are retried before raising the exception, and pages are
+        checkpointed as they are consumed.
+        """
+        checkpoint, records = self._start_history_crawl(
+            url=url, params=params, since=since
+        )
+        next_offset = params["offset"]
+
+        def _submit() -> Tuple[int, asyncio.Future]:
+            nonlocal next_offset
+            offset = next_offset
+            next_offset += params["limit"]
+            task = asyncio.ensure_future(
+                asyncio.to_thread(self._fetch_page, url, dict(params, offset=offset))
+            )
+            return offset, task
+
+        in_flight = deque(_submit() for _ in range(self._max_workers))
+        try:
+            while True:
+                # Tasks are awaited in the order they were submitted, i.e., in offset order
+                offset, task = in_flight.popleft()
+                page_params = dict(params, offset=offset)
+                items = await task
+                for attempt in range(self.MAX_RETRIES):
+                    if items is not None or self._reached_valid_until(records):
+                        break
+                    await asyncio.to_thread(
+                        self._wait_before_retry, attempt, "API returned no items"
+                    )
+                    items = await asyncio.to_thread(self._fetch_page, url, page_params)
+                if items is None:
+                    if self._reached_valid_until(records):
+                        print("\033[36m" + "\tNo more records to fetch!" + "\033[0m")
+                        break
+                    raise self._empty_history_page_error(url, page_params, len(records))
+                if checkpoint is not None:
+                    checkpoint.append(offset=offset, items=items)
+                records.extend(items)
+                if self._is_last_history_page(items, since):
+                    break
+                in_flight.append(_submit())
+        finally:
+            # Past the last record required (or failed), so any pages still in flight are not needed
+            for _, task in in_flight:
+                task.cancel()
+        return self._finish_history_crawl(records, checkpoint)
+
+    def _start_history_crawl(
+        self, url: str, params: dict, since: Optional[datetime.datetime]
+    ) -> Tuple[Optional[CrawlCheckpoint], List[dict]]:
+        """
+        Starts a crawl of the historical API. Returns the checkpoint of the crawl (see `_history_checkpoint`) and the
+        records already fetched by an interrupted crawl, in which case `params["offset"]` is moved on to the offset
+        at which to resume.
+        """
         print(
             "\033[36m"
             + "\tRequesting historical events since {0}...".format(
-                self.HISTORY_VALID_UNTIL
+                self.HISTORY_VALID_UNTIL if since is None else since
             )
             + "\033[0m"
         )
-        df = pd.DataFrame()
-        while True:
-            r = requests.get(
-                url,
-                headers={
-                    "client_id": self.clientID,
-                    "client_secret": self.clientSecret,
-                },
-                params=params,
-            )
-            print("\033[36m" + "\tRequesting from " + r.url + "\033[0m")
-
-            # check response status and use only valid requests
-            if r.status_code == 200:
-                response = r.json()
-                # If no items are returned, handle it here. Think hard on how to handle this.
-                if "items" not in response:
-                    # Raise an exception if the response is empty.
-                    nrecords = df.shape[0]
-
-                    # TODO: handle this exception more elegantly...
-                    # ...Maybe if last record returned is really close to HISTORY_VALID_UNTIL then don't raise an exception.
-                    # Cannot just return records because it gives false impression that all records have been fetched.
-                    raise Exception(
-                        "\n\t!ERROR! \n\tAPI returned no items for request: {0} \n\t! ABORTING !".format(
-                            r.url
-                        )
-                        + "\n\t"
-                        + "-" * 80
-                        + "\n\tThis error is *probably* caused by the API erroneously returning an empty response in place of an error..."
-                        + "\n\t...but it could also be caused by the API genuinely returning no records."
-                        + "\n\tThis might occur if there have been *exactly* an integer multiple of the API limit number of events (e.g., 0, 1000, 2000 etc.)."
-                        + "\n\tAt present there is no way to distinguish between these two cases (which is the fault of the API, not this code)."
-                        + "\n\tIf you think this is the case, try using the _handle_current_api_response function instead or modifying HISTORY_VALID_UNTIL."
-                        + "\n\t"
-                        + "-" * 80
-                        + "\n\tNumber of records fetched before error: {0}".format(
-                            nrecords
-                        )
-                    )
-                else:
-                    df_temp = pd.json_normalize(response["items"])
-                    # Extract the datetime of the last record fetched and cast it to a datetime object
-                    last_record_datetime = pd.to_datetime(df_temp["DateTime"].iloc[-1])
-                    if last_record_datetime < self.HISTORY_VALID_UNTIL:
-                        print(
-                            "\033[36m"
-                            + "\tFound a record with datetime {0} before `valid until' date {1}.".format(
-                                last_record_datetime, self.HISTORY_VALID_UNTIL
-                            )
-                            + "\033[0m"
-                        )
-
-                        # Check the number of rows and compare to the API limit
-                        if df_temp.shape[0] < self.API_LIMIT:
-                            # If the number of records is less than the API limit, then we have fetched all records
-                            print("\033[36m" + "\tLast request contained {0} many records, fewer than the API limit of {1}.".format(df_temp.shape[0], self.API_LIMIT) + "\033[0m")
-                            print("\033[36m" + "\tNo more records to fetch!" + "\033[0m")
-                            df = pd.concat([df, df_temp])
-                            break 
-                        else:
-                            # If the number of records is equal to the API limit, possibly more records to fetch so we continue.
-                            print("\033[36m" + "\tLast request contained {0} many records, equal to the API limit of {1}.".format(df_temp.shape[0], self.API_LIMIT) + "\033[0m")
-                            print("\033[36m" + "\tChecking if there are more records to fetch..." + "\033[0m")
-            else:
-                raise Exception(
-                    "\tRequest failed with status code {0}, and error message: {1}".format(
-                        r.status_code, r.json()
+        checkpoint = self._history_checkpoint(url=url, params=params, since=since)
+        records = []
+        if checkpoint is not None:
+            records, params["offset"] = checkpoint.load(offset=params["offset"])
+            if records:
+                print(
+                    "\033[36m"
+                    + "\tResuming from checkpoint with {0} records, at offset {1}".format(
+                        len(records), params["offset"]
                     )
+                    + "\033[0m"
                 )
-            df = pd.concat([df, df_temp])
-            params["offset"] += params["limit"]  # Increment offset for the next request
-        df.reset_index(drop=True, inplace=True)
+        return checkpoint, records
+
+    def _is_last_history_page(
+        self, items: List[dict], since: Optional[datetime.datetime]
+    ) -> bool:
+        """
+        Returns whether a (non-empty) page of the historical API is the last page needed by the crawl, i.e., it
+        reaches back to before `since`, or it reaches back to before `HISTORY_VALID_UNTIL` and is not a full page.
+        """
+        # Extract the datetime of the last record fetched and cast it to a datetime object
+        last_record_datetime = pd.to_datetime(items[-1]["DateTime"])
+        if since is not None and last_record_datetime < since:
+            print(
+                "\033[36m"
+                + "\tFound a record with datetime {0} before the newest known record {1}.".format(
+                    last_record_datetime, since
+                )
+                + "\033[0m"
+            )
+            print("\033[36m" + "\tNo more new records to fetch!" + "\033[0m")
+            return True
+        if last_record_datetime < self.HISTORY_VALID_UNTIL:
+            print(
+                "\033[36m"
+                + "\tFound a record with datetime {0} before `valid until' date {1}.".format(
+                    last_record_datetime, self.HISTORY_VALID_UNTIL
+                )
+                + "\033[0m"
+            )
+
+            # Check the number of rows and compare to the API limit
+            if len(items) < self.API_LIMIT:
+                # If the number of records is less than the API limit, then we have fetched all records
+                print("\033[36m" + "\tLast request contained {0} many records, fewer than the API limit of {1}.".format(len(items), self.API_LIMIT) + "\033[0m")
+                print("\033[36m" + "\tNo more records to fetch!" + "\033[0m")
+                return True
+            else:
+                # If the number of records is equal to the API limit, possibly more records to fetch so we continue.
+                print("\033[36m" + "\tLast request contained {0} many records, equal to the API limit of {1}.".format(len(items), self.API_LIMIT) + "\033[0m")
+                print("\033[36m" + "\tChecking if there are more records to fetch..." + "\033[0m")
+        return False
+
+    def _reached_valid_until(self, records: List[dict]) -> bool:
+        """
+        Returns whether the records fetched by a crawl of the historical API (newest first) already reach back to
+        before `HISTORY_VALID_UNTIL`. A crawl only requests a further page after such a record if the page was full,
+        so if the further page returns no items, the alert stream ended on a page boundary (i.e., it has an exact
+        multiple of `API_LIMIT` records) and every record needed has been fetched. The crawl then ends without
+        retrying the empty page.
+        """
+        if not records:
+            return False
+        return pd.to_datetime(records[-1]["DateTime"]) < self.HISTORY_VALID_UNTIL
+
+    def _empty_history_page_error(
+        self, url: str, params: dict, nrecords: int
+    ) -> Exception:
+        """
+        Returns the exception raised when a page of the historical API still returns no items after retrying, before
+        the crawl has reached back to `HISTORY_VALID_UNTIL` (see `_reached_valid_until`).
+        """
+        return Exception(
+            "\n\t!ERROR! \n\tAPI returned no items for request: {0} with parameters {1} \n\t! ABORTING !".format(
+                url, params
+            )
+            + "\n\t"
+            + "-" * 80
+            + "\n\tThis error is *probably* caused by the API erroneously returning an empty response in place of an error..."
+            + "\n\t...but it could also be caused by the API genuinely returning no records."
+            + "\n\tThis might occur if there have been *exactly* an integer multiple of the API limit number of events (e.g., 0, 1000, 2000 etc.)."
+            + "\n\tAt present there is no way to distinguish between these two cases (which is the fault of the API, not this code)."
+            + "\n\tIf you think this is the case, try using the _handle_current_api_response function instead or modifying HISTORY_VALID_UNTIL."
+            + "\n\t"
+            + "-" * 80
+            + "\n\tNumber of records fetched before error: {0}".format(nrecords)
+        )
+
+    def _finish_history_crawl(
+        self, records: List[dict], checkpoint: Optional[CrawlCheckpoint]
+    ) -> pd.DataFrame:
+        """
+        Finishes a crawl of the historical API, returning the records fetched as a dataframe and clearing the
+        checkpoint of the crawl.
+        """
+        df = self._records_to_df(records)
+        if checkpoint is not None:
+            # Alerts received during an interrupted crawl shift later records to higher offsets, so a resumed crawl
+            # may have fetched some records twice
+            df = df.drop_duplicates(subset=["LocationName", "DateTime", "AlertType"])
+            df.reset_index(drop=True, inplace=True)
+            checkpoint.clear()
         return df
 
+    def _history_checkpoint(
+        self, url: str, params: dict, since: Optional[datetime.datetime]
+    ) -> Optional[CrawlCheckpoint]:
+        """
+        Returns the checkpoint for a crawl of the historical API, or None if the object was not created with
+        `checkpoint_history`. Each crawl (identified by its URL, parameters and `since`) has its own checkpoint file,
+        so that different crawls do not overwrite each other's checkpoints.
+        """
+        if not self._checkpoint_history:
+            return None
+        key = {
+            "url": url,
+            "params": {k: v for k, v in params.items() if k != "offset"},
+            "since": None if since is None else pd.Timestamp(since).isoformat(),
+            "valid_until": self.HISTORY_VALID_UNTIL.isoformat(),
+        }
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        path = os.path.join(
+            cache_dir(), f"{self._name}_history_crawl_{digest[:16]}.jsonl"
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return CrawlCheckpoint(path=path, key=key)
+
     def _fetch_active_monitors(self) -> Dict[str, Monitor]:
         """
         Returns a dictionary of Monitor objects representing the active monitors.
         """
         df = self._get_current_status_df()
+        return self._status_df_to_monitors(df)
+
+    async def _fetch_active_monitors_async(self) -> Dict[str, Monitor]:
+        """
+        Awaitable version of `_fetch_active_monitors`. Pages of the current status are requested concurrently (up to
+        `max_workers` at once) without blocking the event loop. See `_fetch_pages_async`.
+        """
+        print(
+            "\033[36m"
+            + "Requesting current status data from Thames Water API..."
+            + "\033[0m"
+        )
+        url = self.API_ROOT + self.CURRENT_API_RESOURCE
+        params = {
+            "limit": self.API_LIMIT,
+            "offset": 0,
+        }
+        pages = await self._fetch_pages_async(url=url, params=params)
+        df = self._records_to_df([record for items in pages for record in items])
+        return self._status_df_to_monitors(df)
+
+    def _status_df_to_monitors(self, df: pd.DataFrame) -> Dict[str, Monitor]:
+        """
+        Converts a dataframe of the current status API response to a dictionary of Monitor objects with their
+        current events set.
+        """
         monitors = {}
         for _, row in df.iterrows():
             monitor = self._row_to_monitor(row=row)
@@ -271,112 +1013,192 @@ class ThamesWater(WaterCompany):
     def _events_df_to_events_list(
         self, df: pd.DataFrame, monitor: Monitor
     ) -> List[Event]:
-        def _warn(reason: str) -> None:
-            """Automatically raises a warning with the correct message"""
+        """
+        Builds the history of a monitor (newest first) from its alert stream, as a list of Event objects. See
+        `_events_df_to_history`.
+        """
+        intervals, anomalies = self._build_intervals([(monitor.site_name, df)])
+        self._set_anomalies([monitor.site_name], anomalies)
+        return self._intervals_to_events(monitor, intervals[0])
+
+    def _events_df_to_history(self, df: pd.DataFrame, monitor: Monitor) -> History:
+        """
+        Builds the history of a monitor (newest first) from its alert stream, as a `History` backed by columns, so
+        that Event objects are only created as they are accessed. The current event of the monitor is the first event
+        of the history, unless the alert stream is empty, in which case the history is empty. Any anomalies in the
+        alert stream replace those previously recorded for the monitor (see `WaterCompany.anomalies`).
+        """
+        intervals, anomalies = self._build_intervals([(monitor.site_name, df)])
+        self._set_anomalies([monitor.site_name], anomalies)
+        return self._intervals_to_history(monitor, intervals[0])
+
+    def _build_intervals(
+        self, alert_streams: List[Tuple[str, pd.DataFrame]]
+    ) -> Tuple[List[Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]], pd.DataFrame]:
+        """
+        Pairs the alerts of the alert streams of monitors into the intervals of their events (see
+        `alert_stream_to_intervals`). This is independent for each monitor, so if `history_processes` is greater than
+        1 it is distributed to a pool of processes. Only the compact arrays of alert type codes and datetimes are sent
+        to the processes, and the intervals are sent back.
+
+        Invalid alerts are skipped and collected into a table of anomalies. If there are any, a single warning
+        summarising them is raised.
+
+        Args:
+            alert_streams: Pairs of the names of monitors and their alert streams.
+
+        Returns:
+            A tuple of the start times, end times and kinds of the events of each alert stream (newest first), or None
+            for empty alert streams, and a dataframe of the anomalies in the alert streams, with the LocationName of
+            the monitor, the DateTime of the alert and the kind of Anomaly (see `ANOMALY_TYPES`).
+        """
+        streams = [self._alert_stream_arrays(df, name) for name, df in alert_streams]
+        nonempty = [stream for stream in streams if stream is not None]
+        codes = [stream[0] for stream in nonempty]
+        times = [stream[1].to_numpy() for stream in nonempty]
+        if self._history_processes > 1 and len(nonempty) > 1:
+            chunksize = max(1, len(nonempty) // (4 * self._history_processes))
+            with ProcessPoolExecutor(self._history_processes) as executor:
+                results = executor.map(
+                    alert_stream_to_intervals, codes, times, chunksize=chunksize
+                )
+                results = iter(list(results))
+        else:
+            results = map(alert_stream_to_intervals, codes, times)
+
+        intervals = []
+        anomaly_names, anomaly_times, anomaly_codes = [], [], []
+        for (name, _), stream in zip(alert_streams, streams):
+            print("\033[36m" + f"\tBuilding history for {name}..." + "\033[0m")
+            if stream is None:
+                intervals.append(None)
+                continue
+            starts, ends, kinds, anomalies = next(results)
+            intervals.append((starts, ends, kinds))
+            (invalid,) = np.nonzero(anomalies)
+            if len(invalid) > 0:
+                anomaly_names.append(np.full(len(invalid), name, dtype=object))
+                anomaly_times.append(stream[1].to_numpy()[invalid])
+                anomaly_codes.append(anomalies[invalid])
+
+        def _concatenate(arrays: List[np.ndarray], dtype: type) -> np.ndarray:
+            """Concatenates arrays, which may be an empty list."""
+            return np.concatenate([np.zeros(0, dtype=dtype)] + arrays)
+
+        anomaly_codes = _concatenate(anomaly_codes, np.uint8).astype(np.int64)
+        anomalies = pd.DataFrame(
+            {
+                "LocationName": pd.Categorical(_concatenate(anomaly_names, object)),
+                "DateTime": pd.to_datetime(
+                    _concatenate(anomaly_times, "datetime64[ns]")
+                ),
+                "Anomaly": pd.Categorical.from_codes(
+                    anomaly_codes - 1, categories=list(ANOMALY_TYPES.values())
+                ),
+            }
+        )
+        if not anomalies.empty:
             warnings.warn(
-                f"\033[91m! WARNING ! Alert stream for monitor {monitor.site_name} contains an invalid entry! \nReason: {reason}. Skipping that entry...\033[0m"
+                f"\033[91m! WARNING ! The alert streams of {len(anomaly_names)} monitor(s) contain {len(anomalies)} invalid entries, which were skipped. See the `anomalies` table of the water company for details.\033[0m"
             )
+        return intervals, anomalies
 
-        print("\033[36m" + f"\tBuilding history for {monitor.site_name}..." + "\033[0m")
-        history = []
-        history.append(monitor.current_event)
-        df.reset_index(drop=True, inplace=True)
+    def _alert_stream_arrays(
+        self, df: pd.DataFrame, name: str
+    ) -> Optional[Tuple[np.ndarray, pd.DatetimeIndex]]:
+        """
+        Returns the alert type codes and datetimes of the alert stream of a monitor, or None if the stream is empty.
 
+        Raises:
+            Exception: If the alert stream contains alerts for any other monitor.
+        """
         if df.empty:
-            # If the dataframe is empty, there are no events to create
-            return []
-
+            return None
         if df["LocationName"].unique().size > 1:
             raise Exception(
                 "The dataframe contains events for multiple monitors, beyond the one specified!"
             )
-        if df["LocationName"].unique()[0] != monitor.site_name:
+        if df["LocationName"].unique()[0] != name:
             raise Exception(
                 "The dataframe contains events for a different monitor than the one specified!"
             )
+        return alert_type_codes(df["AlertType"]), pd.DatetimeIndex(df["DateTime"])
 
-        for index, row in df.iterrows():
-            n_rows = len(df)
-            next_index = index + 1
-
-            if index == n_rows - 1:
-                # At the last entry in the df...
-                if not (
-                    (row["AlertType"] == "Start")
-                    or (row["AlertType"] == "Offline start")
-                ):
-                    # ... and it's not a start event!
-                    reason = "the last recorded event is not a Start event!"
-                    _warn(reason)
-                    continue
-                else:
-                    break
+    def _intervals_to_columns(
+        self,
+        name: str,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        kinds: np.ndarray,
+    ) -> EventColumns:
+        """
+        Builds the columns (oldest first) of the history of a monitor from the intervals of its alert stream (see
+        `alert_stream_to_intervals`).
+        """
+        return EventColumns(
+            [name],
+            starts[::-1].astype("datetime64[s]").astype(np.int64),
+            ends[::-1].astype("datetime64[s]").astype(np.int64),
+            kinds[::-1],
+            [0, len(kinds)],
+        )
 
-            if row["AlertType"] == "Stop":
-                # Found the end of an event...
-                if df.iloc[next_index]["AlertType"] != "Start":
-                    # ... but it's not preceded by a start event!
-                    reason = f"a stop event was not preceded by Start event at {df.iloc[index]['DateTime']}"
-                    _warn(reason)
-                    continue
-                else:
-                    # ... its preceded by a start event, so we create a Discharge event!
-                    stop = pd.to_datetime(row["DateTime"])
-                    start = pd.to_datetime(df.iloc[next_index]["DateTime"])
-                    event = Discharge(
-                        monitor=monitor, ongoing=False, start_time=start, end_time=stop
-                    )
-                    history.append(event)
-
-            if row["AlertType"] == "Offline stop":
-                # Found the end of an offline event...
-                if df.iloc[next_index]["AlertType"] != "Offline start":
-                    # ... but it's not preceded by an offline start event!
-                    reason = f"an offline Stop event was not preceded by Offline Start event at {df.iloc[index]['DateTime']}"
-                    _warn(reason)
-                    continue
-                else:
-                    # ... its preceded by an offline start event, so we create an Offline event!
-                    stop = pd.to_datetime(row["DateTime"])
-                    start = pd.to_datetime(df.iloc[index + 1]["DateTime"])
-                    event = Offline(
-                        monitor=monitor, ongoing=False, start_time=start, end_time=stop
-                    )
-                    history.append(event)
+    def _intervals_to_history(
+        self,
+        monitor: Monitor,
+        intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ) -> History:
+        """
+        Builds the history of a monitor from the intervals of its alert stream (see `_build_intervals`), followed
+        by its current event. If the alert stream was empty (i.e., `intervals` is None), the history is empty.
+        """
+        if intervals is None:
+            # If the dataframe is empty, there are no events to create
+            columns = EventColumns([monitor.site_name], [], [], [], [0, 0])
+            return History(monitor, columns)
+        past = self._intervals_to_columns(monitor.site_name, *intervals)
+        # The columns are oldest first, ending with the current event
+        current_event = monitor.current_event
+        columns = EventColumns(
+            [monitor.site_name],
+            np.append(past.start, int(to_epoch(current_event.start_time))),
+            np.append(past.end, ONGOING),
+            np.append(past.event_type, EVENT_TYPE_CODES[current_event.event_type]),
+            [0, len(past) + 1],
+        )
+        return History(monitor, columns, {0: current_event})
 
-            if row["AlertType"] == "Start" or row["AlertType"] == "Offline start":
-                # Found the start of an event...
-                if index == n_rows - 1:
-                    # ... but it's the last entry in the df, so we can't create an event! Quit the loop.
-                    break
-                else:
-                    if (
-                        df.iloc[next_index]["AlertType"] == "Start"
-                        or df.iloc[next_index]["AlertType"] == "Offline start"
-                    ):
-                        # ... and it's followed by another start event!
-                        reason = f"a Start or Offline Start event was preceded by a Start or Offline Start event at {df.iloc[index]['DateTime']}"
-                        _warn(reason)
-                        continue
-                    else:
-                        # ... and it's not followed by another start event, so we create a NoDischarge event
-                        # to represent the period between the start of this event and the end of the previous event.
-                        stop = pd.to_datetime(row["DateTime"])
-                        start = pd.to_datetime(df.iloc[next_index]["DateTime"])
-                        event = NoDischarge(
-                            monitor=monitor,
-                            ongoing=False,
-                            start_time=start,
-                            end_time=stop,
-                        )
-                        history.append(event)
+    def _intervals_to_events(
+        self,
+        monitor: Monitor,
+        intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ) -> List[Event]:
+        """
+        Builds the history of a monitor as a list of Event objects (newest first) from the intervals of its alert
+        stream, following its current event, without building columns first. See `_intervals_to_history`.
+        """
+        if intervals is None:
+            # If the dataframe is empty, there are no events to create
+            return []
+        starts, ends, kinds = intervals
+        # Times are truncated to seconds, as in the columns of a `History`
+        starts = pd.DatetimeIndex(starts.astype("datetime64[s]"))
+        ends = pd.DatetimeIndex(ends.astype("datetime64[s]"))
+        history = [monitor.current_event]
+        for start, end, kind in zip(starts, ends, kinds.tolist()):
+            history.append(
+                EVENT_CLASSES[kind](
+                    monitor=monitor, ongoing=False, start_time=start, end_time=end
+                )
+            )
         return history
 
     def _get_monitor_history(self, monitor: Monitor) -> List[Event]:
         """
         Creates a list of historical Event objects from the alert stream for a given monitor.
         This is done by iterating through the alert stream and creating an Event object for each
-        start/stop event pair. If the alert stream is invalid, a warning is raised and the entry is skipped.
+        start/stop event pair. Invalid entries in the alert stream are skipped, recorded as anomalies (see
+        `WaterCompany.anomalies`) and summarised in a warning.
         If the alert stream is empty, an empty list is returned.
 
         Args:
@@ -385,10 +1207,37 @@ class ThamesWater(WaterCompany):
         Returns:
             List[Event]: A list of Event objects representing the historical events for the monitor
         """
-        # Get the historical data for the monitor from the API
-        events_df = self._get_monitor_events_df(monitor)
+        if self._alert_store is None:
+            # Get the historical data for the monitor from the API
+            events_df = self._get_monitor_events_df(monitor)
+        else:
+            events_df = self._get_stored_monitor_events_df(monitor)
         return self._events_df_to_events_list(df=events_df, monitor=monitor)
 
+    def _get_stored_monitor_events_df(self, monitor: Monitor) -> pd.DataFrame:
+        """
+        Get the historical status of a particular monitor from the alert store, requesting only alerts newer than
+        those already stored from the API and appending them to the store.
+        """
+        stored_df = self._set_dtypes(
+            self._alert_store.load(location_name=monitor.site_name)
+        )
+        # The stored alerts for a monitor are complete up to its newest stored alert, and (for all monitors)
+        # up to the newest alert of the last complete sync of the network.
+        known = [
+            t
+            for t in (
+                self._alert_store.latest(location_name=monitor.site_name),
+                self._alert_store.synced_until,
+            )
+            if t is not None
+        ]
+        since = max(known) if known else None
+        fetched_df = self._get_monitor_events_df(monitor, since=since)
+        new_df = self._new_alerts(old_df=stored_df, new_df=fetched_df)
+        self._alert_store.append(new_df)
+        return self._concat_alerts([new_df, stored_df])
+
     def _row_to_monitor(self, row: pd.DataFrame) -> Monitor:
         """
         Convert a row of the Thames Water active API response to a Monitor object. See `_get_current_status_df`
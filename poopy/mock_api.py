@@ -0,0 +1,435 @@
+"""
+Module providing a local stand-in for the Thames Water open data API, so that fetching, parsing and history building
+can be benchmarked and regression-tested without requesting data from the live API.
+
+The `MockAPIServer` replays current status and alert records (either recorded from the live API with
+`record_fixtures`, or generated with `generate_network`) over HTTP. It honours the `limit` and `offset` pagination
+parameters and the `col_1`/`operand_1`/`value_1` filter used to request the alerts of a single monitor, and can inject
+latency, failed requests and (spuriously) empty pages. A Water Company class is pointed at the server with
+`mock_company`, e.g.:
+
+    status, alerts = generate_network(n_monitors=500, alerts_per_monitor=200)
+    with MockAPIServer(status, alerts, latency=0.05) as server:
+        tw = mock_company(ThamesWater, server.url)("id", "secret")
+        tw.set_all_histories()
+
+A server can also be run from the command line with `python -m poopy.mock_api`.
+"""
+
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from poopy.companies import ThamesWater
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class MockAPIServer:
+    """A class to serve recorded or synthetic Water Company API responses from a local HTTP server.
+
+    Attributes:
+        url: The root URL of the running server (to be used as the `API_ROOT` of a Water Company).
+        request_count: The number of requests the server has received.
+
+    Methods:
+        start: Start serving requests in a background thread.
+        stop: Stop the server.
+    """
+
+    def __init__(
+        self,
+        status_records: List[dict],
+        alert_records: List[dict],
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        empty_rate: float = 0.0,
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        current_resource: str = ThamesWater.CURRENT_API_RESOURCE,
+        historical_resource: str = ThamesWater.HISTORICAL_API_RESOURCE,
+    ) -> None:
+        """
+        Args:
+            status_records: The records returned by the current status resource.
+            alert_records: The records returned by the historical (alerts) resource, newest first.
+            latency: The time in seconds the server waits before responding to each request. Defaults to 0.
+            error_rate: The probability that a request fails with a 500 status code. Defaults to 0.
+            empty_rate: The probability that a request for a page that exists returns no items (as the live API
+                occasionally does). Defaults to 0.
+            seed: The seed of the random number generator used to inject errors. Defaults to None.
+            host: The host to serve on. Defaults to localhost.
+            port: The port to serve on. Defaults to 0, which picks a free port.
+            current_resource: The path of the current status resource. Defaults to that of Thames Water.
+            historical_resource: The path of the historical resource. Defaults to that of Thames Water.
+        """
+        self._resources = {
+            current_resource: status_records,
+            historical_resource: alert_records,
+        }
+        # Index the records by location name to answer filtered requests without scanning every record
+        self._by_location = {}
+        for resource, records in self._resources.items():
+            index = {}
+            for record in records:
+                index.setdefault(record["LocationName"], []).append(record)
+            self._by_location[resource] = index
+        self.latency = latency
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Return the root URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        """Return the number of requests received by the server."""
+        return self._request_count
+
+    def start(self) -> str:
+        """
+        Start serving requests in a background thread.
+
+        Returns:
+            The root URL of the server.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockAPIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _respond(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, dict]:
+        """Returns the status code and JSON body of the response to a request."""
+        with self._lock:
+            self._request_count += 1
+            draw = self._random.random()
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if path not in self._resources:
+            return 404, {"error": f"Unknown resource {path}"}
+        if draw < self.error_rate:
+            return 500, {"error": "Injected server error"}
+        try:
+            limit = int(query.get("limit", ["1000"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+        except ValueError:
+            return 400, {"error": "limit and offset must be integers"}
+        records = self._resources[path]
+        if "col_1" in query:
+            column = query["col_1"][0]
+            operand = query.get("operand_1", ["eq"])[0]
+            value = query.get("value_1", [""])[0]
+            if operand != "eq":
+                return 400, {"error": f"Unsupported operand {operand}"}
+            if column == "LocationName":
+                records = self._by_location[path].get(value, [])
+            else:
+                records = [r for r in records if str(r.get(column)) == value]
+        items = records[offset : offset + limit]
+        if not items or draw < self.error_rate + self.empty_rate:
+            # The API omits the items key entirely when there are no records
+            return 200, {}
+        return 200, {"items": items}
+
+    def _make_handler(self) -> type:
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                parsed = urlparse(self.path)
+                status, body = server._respond(parsed.path, parse_qs(parsed.query))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                # Silence the default logging of every request to stderr
+                pass
+
+        return _Handler
+
+
+def mock_company(
+    company_class: type, url: str, d8_file_path: Optional[str] = None
+) -> type:
+    """
+    Returns a subclass of a Water Company class that requests data from the given root URL (e.g., that of a
+    `MockAPIServer`) rather than the live API. The subclass has its own name, so its files in the cache (e.g., its
+    alert store and crawl checkpoints) are kept apart from those of the real company. The D8 raster is not downloaded:
+    the subclass uses the given file instead.
+
+    Args:
+        company_class: The Water Company class, e.g., `ThamesWater`.
+        url: The root URL of the API to use.
+        d8_file_path: The path of a local D8 raster to use for the flow accumulator. Defaults to None, in which case
+            the accumulator (and the methods that depend on it) is unavailable.
+
+    Returns:
+        A subclass of `company_class`.
+    """
+
+    def _fetch_d8_file(self, url: str, known_hash: str) -> Optional[str]:
+        return d8_file_path
+
+    name = "Mock" + company_class.__name__
+    return type(
+        name,
+        (company_class,),
+        {"NAME": name, "API_ROOT": url, "_fetch_d8_file": _fetch_d8_file},
+    )
+
+
+def generate_network(
+    n_monitors: int,
+    alerts_per_monitor: int,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    offline_fraction: float = 0.05,
+    invalid_fraction: float = 0.0,
+    seed: Optional[int] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Generates synthetic current status and alert records for a network of monitors, in the format of the Thames Water
+    API. Each monitor alternates between not discharging and discharging (or, occasionally, being offline), with
+    exponentially distributed durations, between `start` and `end`. The first event of each monitor starts at `start`,
+    and the current status of each monitor is consistent with its last alert.
+
+    Args:
+        n_monitors: The number of monitors.
+        alerts_per_monitor: The (approximate) number of alerts per monitor.
+        start: The datetime of the earliest alerts. Defaults to None, i.e., 30 days before
+            `ThamesWater.HISTORY_VALID_UNTIL`, as a crawl of the history only ends once it reaches an alert older than
+            that date.
+        end: The datetime of the latest alerts. Defaults to None, i.e., now.
+        offline_fraction: The fraction of events that are offline (rather than discharge) events. Defaults to 0.05.
+        invalid_fraction: The fraction of alerts that are dropped, to create invalid alert sequences (e.g., a Stop
+            not preceded by a Start). Defaults to 0.
+        seed: The seed of the random number generator. Defaults to None.
+
+    Returns:
+        A tuple of the current status records and the alert records (newest first).
+    """
+    rng = np.random.default_rng(seed)
+    if start is None:
+        start = ThamesWater.HISTORY_VALID_UNTIL - datetime.timedelta(days=30)
+    if end is None:
+        end = datetime.datetime.now()
+    span = (end - start).total_seconds()
+    n_events = max(1, alerts_per_monitor // 2)
+    # Mean duration of the gaps between events and of the events themselves, such that events fill the time span
+    mean_gap = 0.8 * span / n_events
+    mean_event = 0.2 * span / n_events
+
+    status_records, alert_records = [], []
+    for i in range(n_monitors):
+        info = {
+            "LocationName": f"Synthetic Monitor {i}",
+            "PermitNumber": f"SYN{i:06d}",
+            "LocationGridRef": "",
+            "X": float(rng.uniform(400000, 600000)),
+            "Y": float(rng.uniform(150000, 250000)),
+            "ReceivingWaterCourse": f"Synthetic River {i % 50}",
+        }
+        # Times are in seconds since `start`
+        gaps = rng.exponential(mean_gap, n_events)
+        # The first event starts at `start`, so the alert stream reaches back to `start`
+        gaps[0] = 0
+        durations = np.maximum(rng.exponential(mean_event, n_events), 60)
+        starts = np.cumsum(gaps + durations) - durations
+        stops = starts + durations
+        offline = rng.random(n_events) < offline_fraction
+        # Drop events that would end in the future, and leave the next event ongoing for some monitors (and always if
+        # no event was kept, so that every monitor has an alert at `start`)
+        keep = stops < span
+        n_kept = int(keep.sum())
+        ongoing = (
+            n_kept < n_events
+            and starts[n_kept] < span
+            and (n_kept == 0 or rng.random() < 0.3)
+        )
+        alerts = []
+        for j in np.flatnonzero(keep):
+            kind = ("Offline start", "Offline stop") if offline[j] else ("Start", "Stop")
+            alerts.append((starts[j], kind[0]))
+            alerts.append((stops[j], kind[1]))
+        if ongoing:
+            alerts.append(
+                (starts[n_kept], "Offline start" if offline[n_kept] else "Start")
+            )
+        if invalid_fraction > 0:
+            alerts = [a for a in alerts if rng.random() >= invalid_fraction]
+        for timestamp, alert_type in alerts:
+            record = dict(info)
+            record["AlertType"] = alert_type
+            record["DateTime"] = _format_time(start, timestamp)
+            alert_records.append(record)
+
+        if alerts:
+            last_time, last_type = alerts[-1]
+        else:
+            last_time, last_type = 0.0, "Stop"
+        status = {
+            "Start": "Discharging",
+            "Offline start": "Offline",
+        }.get(last_type, "Not discharging")
+        record = dict(info)
+        record["AlertStatus"] = status
+        record["StatusChange"] = _format_time(start, last_time)
+        record["AlertPast48Hours"] = bool(
+            span - last_time < 48 * 3600 or status == "Discharging"
+        )
+        status_records.append(record)
+
+    # The API returns alerts newest first. Sorting by datetime string is chronological with the fixed format.
+    alert_records.sort(key=lambda record: record["DateTime"], reverse=True)
+    return status_records, alert_records
+
+
+def _format_time(start: datetime.datetime, seconds: float) -> str:
+    """Formats the datetime a number of seconds after `start` as a string in the format of the API."""
+    return (start + datetime.timedelta(seconds=int(seconds))).strftime(DATETIME_FORMAT)
+
+
+def record_fixtures(company: ThamesWater, path: str) -> None:
+    """
+    Records the current status and all alerts of a Water Company from its (live) API to a JSON file that can be
+    replayed with `load_fixtures` and `MockAPIServer`.
+
+    Args:
+        company: The Water Company to record the API responses of.
+        path: The path of the JSON file to write.
+    """
+    fixtures = {}
+    for key, resource in (
+        ("status", company.CURRENT_API_RESOURCE),
+        ("alerts", company.HISTORICAL_API_RESOURCE),
+    ):
+        records = []
+        params = {"limit": company.API_LIMIT, "offset": 0}
+        while True:
+            items = company._fetch_page(company.API_ROOT + resource, params)
+            if items is None:
+                break
+            records.extend(items)
+            params["offset"] += params["limit"]
+        fixtures[key] = records
+    with open(path, "w") as f:
+        json.dump(fixtures, f)
+
+
+def load_fixtures(path: str) -> Tuple[List[dict], List[dict]]:
+    """
+    Loads current status and alert records recorded with `record_fixtures`.
+
+    Args:
+        path: The path of the JSON file.
+
+    Returns:
+        A tuple of the current status records and the alert records (newest first).
+    """
+    with open(path) as f:
+        fixtures = json.load(f)
+    return fixtures["status"], fixtures["alerts"]
+
+
+def benchmark(
+    server: MockAPIServer, company_class: type = ThamesWater, **kwargs
+) -> Dict[str, float]:
+    """
+    Times fetching the current status, and fetching the alert stream and building the histories of all monitors,
+    for a Water Company served by a `MockAPIServer`.
+
+    Args:
+        server: A running mock API server.
+        company_class: The Water Company class to benchmark. Defaults to `ThamesWater`.
+        **kwargs: Keyword arguments passed to the Water Company (e.g., `max_workers`).
+
+    Returns:
+        A dictionary of the wall times (in seconds) of each stage and the number of requests made.
+    """
+    requests_before = server.request_count
+    tic = time.perf_counter()
+    company = mock_company(company_class, server.url)("mock_id", "mock_secret", **kwargs)
+    toc = time.perf_counter()
+    company.set_all_histories()
+    done = time.perf_counter()
+    company.close()
+    return {
+        "init_and_current_status": toc - tic,
+        "history": done - toc,
+        "requests": server.request_count - requests_before,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve a mock Thames Water API from recorded or synthetic data."
+    )
+    parser.add_argument("--fixtures", help="JSON file recorded with record_fixtures")
+    parser.add_argument("--monitors", type=int, default=500)
+    parser.add_argument("--alerts-per-monitor", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--empty-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.fixtures is not None:
+        status, alerts = load_fixtures(args.fixtures)
+    else:
+        status, alerts = generate_network(
+            n_monitors=args.monitors,
+            alerts_per_monitor=args.alerts_per_monitor,
+            seed=args.seed,
+        )
+    server = MockAPIServer(
+        status,
+        alerts,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        empty_rate=args.empty_rate,
+        seed=args.seed,
+        port=args.port,
+    )
+    print(f"Serving {len(status)} monitors and {len(alerts)} alerts at {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,16 +1,24 @@
+import asyncio
 import datetime
+import os
+import threading
 import warnings
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Union, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import pooch
+import requests
 from geojson import MultiLineString, Feature, FeatureCollection, Point
 from matplotlib.colors import LogNorm
+from requests.adapters import HTTPAdapter
 
 from poopy.d8_accumulator import D8Accumulator
+from poopy.store import AlertStore, cache_dir
 
 
 class Monitor:
@@ -31,12 +39,14 @@ class Monitor:
     Methods:
         print_status: Print the current status of the monitor.
         get_history: Get the historical discharge information for the monitor and store it in the history attribute.
+        get_history_async: Awaitable version of get_history.
         plot_history: Plot the history of events at the monitor. Optionally specify a start date to plot from.
-        total_discharge: Returns the total discharge in minutes since the given datetime.
+        total_discharge: Returns the total discharge in minutes since (and optionally until) the given datetime.
         total_discharge_last_6_months: Returns the total discharge in minutes in the last 6 months (183 days)
         total_discharge_last_12_months: Returns the total discharge in minutes in the last 12 months (365 days)
         total_discharge_since_start_of_year: Returns the total discharge in minutes since the start of the year
         event_at: Returns the event that was occurring at the given time for the given monitor.
+        events_at: Returns the events that were occurring at many times for the given monitor, as a dataframe.
     """
 
     def __init__(
@@ -69,7 +79,9 @@ class Monitor:
         self._water_company: WaterCompany = water_company
         self._discharge_in_last_48h: bool = discharge_in_last_48h
         self._current_event: Event = None
-        self._history: List[Event] = None
+        self._history: Union[List[Event], History] = None
+        # The history as EventColumns, and the state of the history they were built from (see `_event_columns`)
+        self._columns_cache: Tuple = None
 
     @property
     def site_name(self) -> str:
@@ -122,10 +134,20 @@ class Monitor:
         Get the historical data for the monitor and store it in the history attribute.
         """
         self._history = self.water_company._get_monitor_history(self)
+        # The network's indexed histories include this monitor's, so are rebuilt on next use
+        self.water_company._interval_index_cache = {}
+
+    async def get_history_async(self) -> None:
+        """
+        Awaitable version of `get_history`, which does not block the event loop while the history is requested.
+        """
+        self._history = await self.water_company._get_monitor_history_async(self)
+        self.water_company._interval_index_cache = {}
 
     @property
-    def history(self) -> List["Event"]:
-        """Return a list of all past events at the monitor.
+    def history(self) -> Union[List["Event"], "History"]:
+        """Return a list of all past events at the monitor, newest first. If the history was set from columns (see
+        `History`), events are only created as they are accessed.
 
         Raises:
             ValueError: If the history is not yet set.
@@ -134,6 +156,24 @@ class Monitor:
             raise ValueError("History is not yet set!")
         return self._history
 
+    def _event_columns(self) -> "EventColumns":
+        """
+        Return the history of the monitor as `EventColumns`, on which analytics run. If the history is a list of
+        events, the columns are built from it and cached until the list changes.
+
+        Raises:
+            ValueError: If the history is not yet set.
+        """
+        history = self.history
+        if isinstance(history, History):
+            return history.columns
+        state = (len(history), history[0] if history else None)
+        cache = self._columns_cache
+        if cache is None or cache[0] is not history or cache[1] != state:
+            columns = EventColumns.from_histories([self.site_name], [history])
+            self._columns_cache = cache = (history, state, columns)
+        return cache[2]
+
     @property
     def discharge_in_last_48h(self) -> bool:
         # Raise a warning if the discharge_in_last_48h is not set
@@ -153,38 +193,65 @@ class Monitor:
         else:
             self._current_event = event
 
+    def _set_current_event(self, event: "Event") -> None:
+        """
+        Replace the current event of the monitor with a new (ongoing) event. If the history of the monitor is set,
+        the previous current event is replaced in the history by a completed event of the same type that ends when the
+        new event starts, and the new event is added to the front of the history.
+        """
+        previous = self._current_event
+        self.current_event = event
+        if not self._history or self._history[0] is not previous:
+            return
+        if isinstance(self._history, History):
+            # Histories backed by columns are read-only, so replace it rather than materialising it to modify it
+            self._history = self._history._with_current_event(event)
+            return
+        if event.start_time >= previous.start_time:
+            self._history[0] = type(previous)(
+                monitor=self,
+                ongoing=False,
+                start_time=previous.start_time,
+                end_time=event.start_time,
+            )
+        else:
+            self._history.pop(0)
+        self._history.insert(0, event)
+
+    def _refresh(self, other: "Monitor") -> None:
+        """
+        Refresh the attributes describing the monitor from a newly fetched Monitor object for the same site. The
+        current event and history are left unchanged.
+        """
+        self._permit_number = other._permit_number
+        self._x_coord = other._x_coord
+        self._y_coord = other._y_coord
+        self._receiving_watercourse = other._receiving_watercourse
+        self._discharge_in_last_48h = other._discharge_in_last_48h
+
     def print_status(self) -> None:
         """Print the current status of the monitor."""
         if self._current_event is None:
             print("No current event at this Monitor.")
         self._current_event.print()
 
-    def total_discharge(self, since: datetime.datetime = None) -> float:
-        """Returns the total discharge in minutes since the given datetime.
-        If no datetime is given, it will return the total discharge since records began
+    def total_discharge(
+        self, since: datetime.datetime = None, until: datetime.datetime = None
+    ) -> float:
+        """Returns the total discharge in minutes between the given datetimes.
+        If no since datetime is given, it will return the total discharge since records began, and if no until
+        datetime is given, it will return the total discharge until now. The total is looked up from cumulative sums
+        of the durations of discharges (see `EventColumns.total_duration`) rather than by scanning the history.
         """
-        history = self.history
-        total = 0.0
         if since is None:
             since = datetime.datetime(2000, 1, 1)  # A long time ago
-        for event in history:
-            if event.event_type == "Discharging":
-                if event.ongoing:
-                    if event.start_time < since:
-                        # If the start time is before the cut off date, we can take the difference between the current time and the cut off date
-                        total += (datetime.datetime.now() - since).total_seconds() / 60
-                    else:
-                        total += event.duration
-                else:
-                    # If the end time is before the cut off date, we can skip this event
-                    if event.end_time < since:
-                        continue
-                    # If the endtime is after since but start_time is before, we take the difference between the end time and since
-                    elif (event.end_time > since) and (event.start_time < since):
-                        total += (event.end_time - since).total_seconds() / 60
-                    elif event.end_time > since:
-                        total += event.duration
-        return total
+        now = to_epoch(datetime.datetime.now())
+        until = now if until is None else to_epoch(until)
+        columns = self._event_columns()
+        total = columns.total_duration(
+            EVENT_TYPE_CODES["Discharging"], to_epoch(since), until, now=now
+        )
+        return float(total / 60)
 
     def total_discharge_last_6_months(self) -> float:
         """Returns the total discharge in minutes in the last 6 months (183 days)"""
@@ -260,6 +327,7 @@ class Monitor:
         """
         Returns the event that is ongoing at the given time for the given monitor.
         If no event is found (e.g., the time was before a monitor was installed), it returns None.
+        The event is found by a binary search of the start times of the events (see `EventColumns.events_at`).
 
         Args:
             time: The time to check for an event.
@@ -267,82 +335,61 @@ class Monitor:
         Returns:
             The event that is ongoing at the given time for the given monitor.
         """
-        out = None
-        for event in self.history:
-            if event.ongoing and time > event.start_time:
-                # If the event is ongoing and the time is after the start time, then it is the current event
-                out = event
-            elif event.start_time < time and time < event.end_time:
-                # If the event is not ongoing but the time is between the start and end time, then it is the current event
-                out = event
-        return out
+        columns = self._event_columns()
+        row = columns.events_at([to_epoch(time)])[0]
+        if row < 0:
+            return None
+        return self.history[len(columns) - 1 - row]
+
+    def events_at(
+        self, times: Union[List[datetime.datetime], np.ndarray, pd.Series]
+    ) -> pd.DataFrame:
+        """
+        Returns the events that were ongoing at many times at once, without creating Event objects. This is a
+        vectorised version of `event_at`.
+
+        Args:
+            times: The times to check for events.
+
+        Returns:
+            A dataframe with a row for each time, giving the datetime, the index in the history of the event ongoing
+            at that time (or -1 if there was none) and its event_type (or NaN if there was none).
+        """
+        columns = self._event_columns()
+        times = pd.DatetimeIndex(pd.to_datetime(times))
+        rows = columns.events_at(to_epoch_array(times))
+        found = rows >= 0
+        codes = np.full(len(rows), -1, dtype=np.int64)
+        codes[found] = columns.event_type[rows[found]]
+        # Unknown event types have no code in EVENT_TYPE_CODES
+        codes[codes >= len(EVENT_TYPE_CODES)] = -1
+        return pd.DataFrame(
+            {
+                "datetime": times,
+                "history_index": np.where(found, len(columns) - 1 - rows, -1),
+                "event_type": pd.Categorical.from_codes(
+                    codes, categories=list(EVENT_TYPE_CODES)
+                ),
+            }
+        )
 
     def _history_masks(
-        self, times: List[datetime.datetime]
+        self, times: Union[List[datetime.datetime], np.ndarray]
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-        online = np.zeros(len(times), dtype=bool)
-        active = np.zeros(len(times), dtype=bool)
-        recent = np.zeros(len(times), dtype=bool)
         """
-        Returns three boolean arrays that indicate, respectively, whether the monitor was online, active, 
+        Returns three boolean arrays that indicate, respectively, whether the monitor was online, active,
         or recently active (within 48 hours) at each time given in the times list. The times list should be
         regularly spaced in 15 minute intervals. The arrays are returned in the same order as the times list.
         This is a hidden method that is used by the get_monitor_timeseries() method in the WaterCompany class.
+        See `history_masks`.
 
         Args:
-            times: A list of times to check the monitor status at.
+            times: A list (or datetime64 array) of times to check the monitor status at.
 
         Returns:
-            A tuple of three boolean arrays indicating whether the monitor was online, active, or recently active.  
-        
+            A tuple of three boolean arrays indicating whether the monitor was online, active, or recently active.
         """
-
-        if len(self.history) == 0:
-            print(f"Monitor {self.site_name} has no recorded events")
-            return online, active, recent
-
-        first_event = round_time_down_15(self.history[-1].start_time)
-        # If first event is before the first time in the times list, then we need to fill the online array with 1s
-        if first_event < times[0]:
-            online[:] = True
-        else:
-            online[times.index(first_event) :] = True
-
-        for event in self.history:
-            if event.event_type == "Discharging" or event.event_type == "Offline":
-                start_round = round_time_down_15(event.start_time)
-                if start_round < times[0]:
-                    # Quit loop if start_round is before the first time in the times list
-                    break
-                if event.ongoing:
-                    # If the event is ongoing, then we can set the active array to True from the start_round to the end of
-                    # the array
-                    if event.event_type == "Discharging":
-                        active[times.index(start_round) :] = True
-                        recent[times.index(start_round) :] = True
-                    else:
-                        online[times.index(start_round) :] = False
-                else:
-                    # If the event is not ongoing, then we can set the active array to True from the start_round to the
-                    # end_round
-                    end_round = round_time_up_15(event.end_time)
-                    if event.event_type == "Discharging":
-                        active[times.index(start_round) : times.index(end_round)] = True
-                        # Set recent to True from start_round to 48 hours after end_round
-                        recent_end = end_round + datetime.timedelta(hours=48)
-                        if recent_end > times[-1]:
-                            # If recent_end is after the end of the array, then set recent to True from start_round to the end of the array
-                            recent[times.index(start_round) :] = True
-                        else:
-                            recent[
-                                times.index(start_round) : times.index(recent_end)
-                            ] = True
-                    else:
-                        online[
-                            times.index(start_round) : times.index(end_round)
-                        ] = False
-
-        return online, active, recent
+        return history_masks(self._event_columns(), times)
 
 
 class Event(ABC):
@@ -536,251 +583,1743 @@ class NoDischarge(Event):
         self._event_type = "Not Discharging"
 
 
-class WaterCompany(ABC):
-    """
-    A class that represents the EDM monitoring network for a Water Company.
+# The event classes, indexed by the integer event type codes used by the columnar event store (see `EventColumns`)
+EVENT_CLASSES = (Discharge, Offline, NoDischarge)
+EVENT_TYPE_CODES = {"Discharging": 0, "Offline": 1, "Not Discharging": 2}
+# The end time stored in the columnar event store for ongoing events
+ONGOING = np.iinfo(np.int64).max
+# The columns of tables of the attributes of monitors (as named in the alert streams of the APIs)
+MONITOR_ATTRIBUTE_COLUMNS = [
+    "LocationName",
+    "PermitNumber",
+    "X",
+    "Y",
+    "ReceivingWaterCourse",
+]
+
+
+def to_epoch(time: datetime.datetime) -> float:
+    """Returns a (naive) datetime as seconds since the epoch, the unit of times in the columnar event store."""
+    return pd.Timestamp(time).value / 1e9
+
+
+def to_epoch_array(
+    times: Union[List[datetime.datetime], np.ndarray, pd.Series]
+) -> np.ndarray:
+    """Returns (naive) datetimes as an array of seconds since the epoch."""
+    return pd.DatetimeIndex(pd.to_datetime(times)).as_unit("ns").asi8 / 1e9
+
+
+def from_epoch(seconds: int) -> pd.Timestamp:
+    """Returns seconds since the epoch as a (naive) timestamp."""
+    return pd.Timestamp(int(seconds), unit="s")
+
+
+class EventColumns:
+    """A class to store the histories of events at one or more monitors as columns (numpy arrays), rather than as lists
+    of `Event` objects. This is much more compact, and allows analytics over many events (or monitors) to be
+    vectorised. Events are stored in contiguous blocks of rows per monitor, oldest first within each block.
 
     Attributes:
-        name: The name of the Water Company network (set by the child class).
-        timestamp: The timestamp of the last update.
-        history_timestamp: The timestamp of the last historical data update (set in the `get_history` method of the child class).
-        clientID: The client ID for the Water Company API (set by the child class).
-        clientSecret: The client secret for the Water Company API (set by the child class).
-        active_monitors: A dictionary of active monitors accessed by site name.
-        active_monitor_names: A list of the names of active monitors.
-        accumulator: The D8 flow accumulator for the region of the water company.
-        discharging_monitors: A list of all monitors that are currently recording a discharge event.
-        recently_discharging_monitors: A list of all monitors that have discharged in the last 48 hours.
+        monitor_names: The names of the monitors, in the order of their blocks of rows.
+        start: The start times of the events (int64 seconds since the epoch).
+        end: The end times of the events (int64 seconds since the epoch), or `ONGOING` for ongoing events.
+        event_type: The types of the events (uint8 codes, see `EVENT_TYPE_CODES`).
+        offsets: The rows of the events of the i-th monitor are `offsets[i]:offsets[i + 1]`.
+        monitor: The index (in `monitor_names`) of the monitor of each event.
+        ongoing: Whether each event is ongoing.
+
     Methods:
-        update: Updates the active_monitors list and the timestamp.
-        set_all_histories: Sets the historical data for all active monitors and store it in the history attribute of each monitor.
-        history_to_discharge_df: Convert a water company's total discharge history to a dataframe
-        get_downstream_geojson: Get a geojson of the downstream points for all active discharges in BNG coordinates.
-        get_downstream_info_geojson: Get a GeoJSON feature collection of the downstream points for all active discharges in BNG coordinates.
-        plot_current_status: Plot the current status of the Water Company network showing the downstream impact & monitor statuses.
+        from_histories: Build the columns from lists of events (newest first, as stored in `Monitor.history`).
+        concatenate: Concatenate the columns of several (sets of) monitors.
+        monitor_events: Return the columns of a single monitor.
+        end_or_now: Return the end times of the events, with ongoing events ending at the given (or current) time.
+        events_at: Return the rows of the events that were occurring at the given times.
+        overlapping: Return the rows of the events that overlap a window of time.
+        total_duration: Return the total duration of the events of a type within a window.
     """
 
-    def __init__(self, clientID: str, clientSecret: str):
+    def __init__(
+        self,
+        monitor_names: List[str],
+        start: np.ndarray,
+        end: np.ndarray,
+        event_type: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
         """
-        Initialize attributes to describe a Water Company network.
-
         Args:
-            clientID: The client ID for the Water Company API.
-            clientSecret: The client secret for the Water Company API.
+            monitor_names: The names of the monitors, in the order of their blocks of rows.
+            start: The start times of the events (seconds since the epoch).
+            end: The end times of the events (seconds since the epoch), or `ONGOING` for ongoing events.
+            event_type: The types of the events (see `EVENT_TYPE_CODES`).
+            offsets: The offsets of the blocks of rows of each monitor (of length `len(monitor_names) + 1`).
         """
-        self._name: str = None
-        self._clientID = clientID
-        self._clientSecret = clientSecret
-        self._active_monitors: Dict[str, Monitor] = self._fetch_active_monitors()
-        self._timestamp: datetime.datetime = datetime.datetime.now()
-        self._accumulator: D8Accumulator = None
-        self._d8_file_path: str = None
-
-    @abstractmethod
-    def _fetch_active_monitors(self) -> Dict[str, Monitor]:
+        self._monitor_names = list(monitor_names)
+        self._start = np.asarray(start, dtype=np.int64)
+        self._end = np.asarray(end, dtype=np.int64)
+        self._event_type = np.asarray(event_type, dtype=np.uint8)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._monitor: np.ndarray = None
+        self._start_index_cache: Dict[Tuple, Tuple[np.ndarray, ...]] = {}
+        self._ongoing_rows_cache: Dict[Optional[int], np.ndarray] = {}
+        self._duration_index_cache: Dict[int, Tuple[np.ndarray, ...]] = {}
+        if len(self._offsets) != len(self._monitor_names) + 1:
+            raise ValueError("There must be one more offset than monitors.")
+        n_events = self._offsets[-1]
+        if not (
+            len(self._start) == len(self._end) == len(self._event_type) == n_events
+        ):
+            raise ValueError("The columns must all have one row per event.")
+
+    @classmethod
+    def from_histories(
+        cls, monitor_names: List[str], histories: List[List["Event"]]
+    ) -> "EventColumns":
         """
-        Get the current status of the monitors by calling the API.
+        Build the columns from the histories of monitors.
+
+        Args:
+            monitor_names: The names of the monitors.
+            histories: The history of each monitor, newest first (as stored in `Monitor.history`).
 
         Returns:
-            A dictionary of active monitors accessed by site name.
+            The columns of the events of the monitors.
         """
-        pass
-
-    @abstractmethod
-    def _get_monitor_history(self, monitor: Monitor) -> List[Event]:
+        start, end, event_type, offsets = [], [], [], [0]
+        for history in histories:
+            for event in reversed(history):
+                start.append(int(to_epoch(event.start_time)))
+                end.append(ONGOING if event.ongoing else int(to_epoch(event._end_time)))
+                event_type.append(EVENT_TYPE_CODES.get(event.event_type, 255))
+            offsets.append(len(start))
+        return cls(monitor_names, start, end, event_type, offsets)
+
+    @classmethod
+    def concatenate(cls, columns: List["EventColumns"]) -> "EventColumns":
         """
-        Get the history of events for a monitor.
+        Concatenate the columns of several (sets of) monitors.
 
         Args:
-            monitor: The monitor for which to get the history.
+            columns: The columns to concatenate.
 
         Returns:
-            A list of events.
-        """
-        pass
-
-    @abstractmethod
-    def set_all_histories(self) -> None:
-        """
-        Sets the historical data for all active monitors and store it in the history attribute of each monitor.
-        """
-        pass
-
-    def _fetch_d8_file(self, url: str, known_hash: str) -> str:
-        """
-        Get the path to the D8 file for the catchment. If the file is not present, it will download it from the given url.
-        This is all handled by the pooch package. The hash of the file is checked against the known hash to ensure the file is not corrupted.
-        If the file is already present in the pooch cache, it will not be downloaded again.
+            The columns of the events of all of the monitors.
         """
-        file_path = pooch.retrieve(url=url, known_hash=known_hash)
+        offsets = [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for column in columns:
+            offsets.append(column.offsets[1:] + total)
+            total += len(column)
+
+        def _concatenate(arrays: List[np.ndarray], dtype: type) -> np.ndarray:
+            """Concatenates arrays, which may be an empty list."""
+            return np.concatenate([np.zeros(0, dtype=dtype)] + arrays)
+
+        return cls(
+            [name for column in columns for name in column.monitor_names],
+            _concatenate([column.start for column in columns], np.int64),
+            _concatenate([column.end for column in columns], np.int64),
+            _concatenate([column.event_type for column in columns], np.uint8),
+            np.concatenate(offsets),
+        )
 
-        return file_path
+    def __len__(self) -> int:
+        """Return the number of events."""
+        return len(self._start)
 
-    # Define the getters for the WaterCompany class
     @property
-    def name(self) -> str:
-        """Return the name of the Water Company network."""
-        return self._name
+    def monitor_names(self) -> List[str]:
+        """Return the names of the monitors, in the order of their blocks of rows."""
+        return self._monitor_names
 
     @property
-    def timestamp(self) -> datetime.datetime:
-        """Return the timestamp of the last update."""
-        return self._timestamp
+    def start(self) -> np.ndarray:
+        """Return the start times of the events in seconds since the epoch."""
+        return self._start
 
     @property
-    def history_timestamp(self) -> datetime.datetime:
-        """Return the timestamp of the last historical data update."""
-        return self._history_timestamp
+    def end(self) -> np.ndarray:
+        """Return the end times of the events in seconds since the epoch (`ONGOING` for ongoing events)."""
+        return self._end
 
     @property
-    def clientID(self) -> str:
-        """Return the client ID for the API."""
-        return self._clientID
+    def event_type(self) -> np.ndarray:
+        """Return the type codes of the events (see `EVENT_TYPE_CODES`)."""
+        return self._event_type
 
     @property
-    def clientSecret(self) -> str:
-        """Return the client secret for the API."""
-        return self._clientSecret
+    def offsets(self) -> np.ndarray:
+        """Return the offsets of the blocks of rows of each monitor."""
+        return self._offsets
 
     @property
-    def active_monitors(self) -> List[Monitor]:
-        """Return the active monitors."""
-        return self._active_monitors
+    def monitor(self) -> np.ndarray:
+        """Return the index of the monitor of each event."""
+        if self._monitor is None:
+            self._monitor = np.repeat(
+                np.arange(len(self._monitor_names), dtype=np.int32),
+                np.diff(self._offsets),
+            )
+        return self._monitor
 
     @property
-    def active_monitor_names(self) -> List[str]:
-        """Return the names of active monitors."""
-        return list(self._active_monitors.keys())
+    def ongoing(self) -> np.ndarray:
+        """Return whether each event is ongoing."""
+        return self._end == ONGOING
 
-    @property
-    def discharging_monitors(self) -> List[Monitor]:
-        """Return a list of all monitors that are currently recording a discharge event."""
-        return [
-            monitor
-            for monitor in self._active_monitors.values()
-            if monitor.current_status == "Discharging"
-        ]
+    def end_or_now(self, now: Optional[float] = None) -> np.ndarray:
+        """
+        Return the end times of the events, with ongoing events ending at the given time.
 
-    @property
-    def recently_discharging_monitors(self) -> List[Monitor]:
-        """Return a list of all monitors that have discharged in the last 48 hours."""
-        return [
-            monitor
-            for monitor in self._active_monitors.values()
-            if monitor.discharge_in_last_48h
-        ]
+        Args:
+            now: The time (seconds since the epoch) at which ongoing events end. Defaults to None, the current time.
 
-    @property
-    def accumulator(self) -> D8Accumulator:
-        """Return the D8 flow accumulator for the area of the water company."""
-        if self._accumulator is None:
-            self._accumulator = D8Accumulator(self._d8_file_path)
-        return self._accumulator
+        Returns:
+            The end times of the events in seconds since the epoch (as floats).
+        """
+        if now is None:
+            now = to_epoch(datetime.datetime.now())
+        return np.where(self.ongoing, now, self._end.astype(np.float64))
 
-    def update(self):
+    def _start_index(
+        self, event_type: Optional[int] = None, complete: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Update the active_monitors list and the timestamp.
+        Return an index of the events (optionally only those of a type, and only those that are complete) sorted by
+        start time, i.e., the rows of the events in order of start time (stably, so events that start at the same time
+        keep their order), their sorted start times, and the running maximum of their end times in that order. The
+        index is built on first use and cached.
         """
-        self._active_monitors = self._fetch_active_monitors()
-        self._timestamp = datetime.datetime.now()
+        key = (event_type, complete)
+        if key not in self._start_index_cache:
+            rows = np.ones(len(self), dtype=bool)
+            if event_type is not None:
+                rows &= self._event_type == event_type
+            if complete:
+                rows &= ~self.ongoing
+            (rows,) = np.nonzero(rows)
+            order = rows[np.argsort(self._start[rows], kind="stable")]
+            self._start_index_cache[key] = (
+                order,
+                self._start[order],
+                np.maximum.accumulate(self._end[order]),
+            )
+        return self._start_index_cache[key]
 
-    def _calculate_downstream_impact(
-        self, include_recent_discharges: bool = False
-    ) -> None:
+    def events_at(self, times: np.ndarray) -> np.ndarray:
         """
-        Calculate the downstream impact for all active discharges. Stores a 2D numpy array to the WaterCompany called 'num_upstream_discharges'
-        that contains the number of upstream discharges at each point in the flow accumulator. The optional argument include_recent_discharges allows you to
-        include discharges that have occurred in the last 48 hours. Defaults to False.
-
-        This function returns None but stores the result (a 2D numpy array) in the WaterCompany object.
+        Return the row of the event that is ongoing at each of the given times, for the columns of a single monitor.
+        An event is ongoing at the times strictly between its start and end. If events overlap, the event that
+        started first is returned. Each lookup is a binary search of the start time index (see `_start_index`).
 
         Args:
-            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+            times: The times (seconds since the epoch) at which to find the ongoing events.
+
+        Returns:
+            The row of the event ongoing at each time, or -1 if no event is ongoing at that time.
         """
+        times = np.asarray(times, dtype=np.float64)
+        if len(self) == 0:
+            return np.full(times.shape, -1, dtype=np.int64)
+        order, starts, max_ends = self._start_index()
+        # The last event (in order of start time) that started before each time...
+        last_started = np.searchsorted(starts, times, side="left") - 1
+        # ... and the first event that ends after each time, if it started before the time, is ongoing at that time
+        first_unended = np.searchsorted(max_ends, times, side="right")
+        found = first_unended <= last_started
+        first_unended = np.minimum(first_unended, len(order) - 1)
+        return np.where(found, order[first_unended], -1)
+
+    def overlapping(
+        self,
+        since: float,
+        until: Optional[float] = None,
+        event_type: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Return the rows of the events (optionally only those of a type) that overlap the window [since, until), i.e.,
+        that start before until and end after since. If until is not given, return the events ongoing at since (as
+        `events_at`). Complete events are found from the start time index (see `_start_index`): a binary search
+        bounds those that started before until, and a binary search of the running maximum of their end times skips
+        those that ended long before since. Ongoing events are checked directly.
 
-        # Extract all the xy coordinates of active discharges
-        accumulator = self.accumulator
-        # Coords of all active discharges in OSGB
-        if not include_recent_discharges:
-            source_nodes = [
-                accumulator.coord_to_node(discharge.x_coord, discharge.y_coord)
-                for discharge in self.discharging_monitors
-            ]
-        else:
-            source_nodes = [
-                accumulator.coord_to_node(discharge.x_coord, discharge.y_coord)
-                for discharge in self.recently_discharging_monitors
-            ]
+        Args:
+            since: The start of the window (seconds since the epoch).
+            until: The end of the window (seconds since the epoch). Defaults to None, i.e., since.
+            event_type: The type code of the events (see `EVENT_TYPE_CODES`). Defaults to None, events of any type.
 
-        # Set up the source array for propagating discharges downstream
-        source_array = np.zeros(accumulator.arr.shape).flatten()
-        source_array[source_nodes] = 1
-        source_array = source_array.reshape(accumulator.arr.shape)
-        # Propagate the discharges downstream and add the result to the WaterCompany object
-        return accumulator.accumulate(source_array)
+        Returns:
+            The rows of the events, in increasing order.
+        """
+        if until is None:
+            until = since
+        order, starts, max_ends = self._start_index(event_type, complete=True)
+        started = np.searchsorted(starts, until, side="left")
+        first_unended = np.searchsorted(max_ends[:started], since, side="right")
+        candidates = order[first_unended:started]
+        rows = candidates[self._end[candidates] > since]
+        ongoing_rows = self._ongoing_rows(event_type)
+        ongoing_rows = ongoing_rows[self._start[ongoing_rows] < until]
+        return np.union1d(rows, ongoing_rows)
+
+    def _ongoing_rows(self, event_type: Optional[int] = None) -> np.ndarray:
+        """
+        Return the rows of the ongoing events (optionally only those of a type). The rows are found on first use and
+        cached.
+        """
+        if event_type not in self._ongoing_rows_cache:
+            ongoing = self.ongoing
+            if event_type is not None:
+                ongoing &= self._event_type == event_type
+            self._ongoing_rows_cache[event_type] = np.nonzero(ongoing)[0]
+        return self._ongoing_rows_cache[event_type]
+
+    def _duration_index(self, event_type: int) -> Tuple[np.ndarray, ...]:
+        """
+        Return an index of the complete events of a type, i.e., their sorted start times and sorted end times, each
+        with their cumulative sums (starting from 0). The index is built on first use and cached.
+        """
+        if event_type not in self._duration_index_cache:
+            complete = (self._event_type == event_type) & ~self.ongoing
+            starts = np.sort(self._start[complete])
+            ends = np.sort(self._end[complete])
+            self._duration_index_cache[event_type] = (
+                starts,
+                np.concatenate(([0], np.cumsum(starts))),
+                ends,
+                np.concatenate(([0], np.cumsum(ends))),
+            )
+        return self._duration_index_cache[event_type]
 
-    def get_downstream_geojson(
-        self, include_recent_discharges: bool = False
-    ) -> MultiLineString:
+    def _cumulative_duration(
+        self, event_type: int, time: Union[float, np.ndarray]
+    ) -> Union[float, np.ndarray]:
         """
-        Get a MultiLineString of the downstream points for all active discharges in BNG coordinates.
+        Return the total duration in seconds of the complete events of a type before the given time(s), using binary
+        searches of the duration index (see `_duration_index`). Events that have ended contribute their duration and
+        events that have started but not ended contribute the time since they started.
+        """
+        starts, start_sums, ends, end_sums = self._duration_index(event_type)
+        n_started = np.searchsorted(starts, time, side="left")
+        n_ended = np.searchsorted(ends, time, side="right")
+        return (
+            end_sums[n_ended]
+            + time * (n_started - n_ended)
+            - start_sums[n_started]
+        )
+
+    def total_duration(
+        self,
+        event_type: int,
+        since: Union[float, np.ndarray],
+        until: Union[float, np.ndarray],
+        now: Optional[float] = None,
+    ) -> Union[float, np.ndarray]:
+        """
+        Return the total duration of the events of a type within the window [since, until), for the columns of a
+        single monitor. This is O(log n) in the number of events, so many windows can be computed cheaply (and at
+        once, if since and until are arrays).
 
         Args:
-            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+            event_type: The type code of the events (see `EVENT_TYPE_CODES`).
+            since: The start of the window (seconds since the epoch).
+            until: The end of the window (seconds since the epoch).
+            now: The time (seconds since the epoch) at which ongoing events end. Defaults to None, the current time.
 
         Returns:
-            A geojson MultiLineString of the downstream points for all active (or optionally recent) discharges.
+            The total duration in seconds.
         """
-        # Calculate the downstream impact
-        downstream_impact = self._calculate_downstream_impact(
-            include_recent_discharges=include_recent_discharges
+        since = np.asarray(since, dtype=np.float64)
+        until = np.asarray(until, dtype=np.float64)
+        total = np.maximum(
+            self._cumulative_duration(event_type, until)
+            - self._cumulative_duration(event_type, since),
+            0,
         )
-        # Convert the downstream impact to a geojson
-        return self._accumulator.get_channel_segments(downstream_impact, threshold=0.9)
-
-    def get_downstream_info_geojson(
-        self, include_recent_discharges=False
-    ) -> FeatureCollection:
+        ongoing_rows = self._ongoing_rows(event_type)
+        if len(ongoing_rows):
+            if now is None:
+                now = to_epoch(datetime.datetime.now())
+            starts = self._start[ongoing_rows].reshape((-1,) + (1,) * since.ndim)
+            total = total + np.maximum(
+                np.minimum(until, now) - np.maximum(starts, since), 0
+            ).sum(axis=0)
+        return total[()] if total.ndim == 0 else total
+
+    def monitor_events(self, index: int) -> "EventColumns":
         """
-        Get a GeoJSON feature collection of the downstream points for all active discharges in BNG coordinates.
-        Each feature contains as properties: 1) the number of upstream discharges 2) the number of upstream discharges
-        per km2 upstream and 3) a list of the active (or recent) discharging EDMs upstream.
+        Return the columns of a single monitor. The columns are views of these columns, so are not copied.
 
         Args:
-            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+            index: The index of the monitor in `monitor_names`.
 
         Returns:
-            A GeoJSON feature collection of the downstream points for all active (or optionally recent) discharges.
+            The columns of the events of the monitor.
         """
-        trsfm = self.accumulator.ds.GetGeoTransform()
-        cell_area = (trsfm[1] * trsfm[5] * -1) / 1000000
-        areas = np.ones(self.accumulator.arr.shape) * cell_area
-        drainage_area = self.accumulator.accumulate(areas)
-        impact = self._calculate_downstream_impact(
-            include_recent_discharges=include_recent_discharges
+        first, last = self._offsets[index], self._offsets[index + 1]
+        return EventColumns(
+            [self._monitor_names[index]],
+            self._start[first:last],
+            self._end[first:last],
+            self._event_type[first:last],
+            [0, last - first],
         )
-        impact_per_area = impact / drainage_area
-        impact = impact.flatten()
-        impact_per_area = impact_per_area.flatten()
-        dstream_nodes = np.where(impact > 0)[0]
 
-        # Create a dictionary of properties for each node
-        dstream_info = {
-            node: {
-                "number_upstream_CSOs": impact[node],
-                "number_CSOs_per_km2": impact_per_area[node],
-                "CSOs": [],
-            }
-            for node in dstream_nodes
-        }
-        if include_recent_discharges:
-            sources = self.recently_discharging_monitors
-        else:
-            sources = self.discharging_monitors
 
-        # Add the sources for each impacted node to the dictionary of properties
-        for monitor in sources:
-            node = self.accumulator.coord_to_node(monitor.x_coord, monitor.y_coord)
+class History(Sequence):
+    """A class to represent the history of events at a monitor, newest first, backed by `EventColumns`. Event objects
+    are only created (and then kept) when they are accessed, e.g., when the history is indexed or iterated.
+
+    Attributes:
+        columns: The columns of the events at the monitor (oldest first).
+    """
+
+    def __init__(
+        self,
+        monitor: Monitor,
+        columns: EventColumns,
+        events: Optional[Dict[int, "Event"]] = None,
+    ) -> None:
+        """
+        Args:
+            monitor: The monitor at which the events occurred.
+            columns: The columns of the events at the monitor (oldest first).
+            events: Events that already exist, accessed by their index in the history (e.g., the current event of
+                the monitor at index 0). Defaults to None.
+        """
+        self._monitor = monitor
+        self._columns = columns
+        self._events: Dict[int, Event] = dict(events) if events else {}
+
+    @property
+    def columns(self) -> EventColumns:
+        """Return the columns of the events at the monitor (oldest first)."""
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["Event", List["Event"]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("History index out of range")
+        event = self._events.get(index)
+        if event is None:
+            event = self._materialise(len(self) - 1 - index)
+            self._events[index] = event
+        return event
+
+    def __repr__(self) -> str:
+        return f"History({self._monitor.site_name}, {len(self)} events)"
+
+    def _with_current_event(self, event: "Event") -> "History":
+        """
+        Return the history with a new (ongoing) current event added to the front. The previous current event (the
+        first event) is replaced by a completed event that ends when the new event starts, or is removed if the new
+        event started before it (see `Monitor._set_current_event`). The columns are extended rather than creating
+        every Event object, and the events already created are kept at their new indices.
+        """
+        previous = self[0]
+        columns = self._columns
+        start, end, event_type = columns.start, columns.end.copy(), columns.event_type
+        if event.start_time >= previous.start_time:
+            end[-1] = int(to_epoch(event.start_time))
+            events = {index + 1: e for index, e in self._events.items() if index > 0}
+            events[1] = type(previous)(
+                monitor=self._monitor,
+                ongoing=False,
+                start_time=previous.start_time,
+                end_time=event.start_time,
+            )
+        else:
+            start, end, event_type = start[:-1], end[:-1], event_type[:-1]
+            events = {index: e for index, e in self._events.items() if index > 0}
+        events[0] = event
+        columns = EventColumns(
+            columns.monitor_names,
+            np.append(start, int(to_epoch(event.start_time))),
+            np.append(end, ONGOING),
+            np.append(event_type, EVENT_TYPE_CODES[event.event_type]),
+            [0, len(start) + 1],
+        )
+        return History(self._monitor, columns, events)
+
+    def _materialise(self, row: int) -> "Event":
+        """Create the Event object for a row of the columns."""
+        columns = self._columns
+        ongoing = columns.end[row] == ONGOING
+        return EVENT_CLASSES[columns.event_type[row]](
+            monitor=self._monitor,
+            ongoing=bool(ongoing),
+            start_time=from_epoch(columns.start[row]),
+            end_time=None if ongoing else from_epoch(columns.end[row]),
+        )
+
+
+class TimeseriesPyramid:
+    """A class to store the timeseries of the number of monitors of a Water Company network that were discharging,
+    recently discharging (within 48 hours) and online (see `WaterCompany.get_monitor_timeseries`) at several
+    resolutions, so that charts can be zoomed from years to hours without recomputing the finest timeseries.
+
+    Each level is a dataframe indexed by the start of its buckets. For each bucket, it gives the number of monitors
+    that were discharging, recently discharging and online at any point in the bucket (exactly as
+    `WaterCompany.get_monitor_timeseries` with the step of the level), and the monitor-minutes of each (e.g., two
+    monitors discharging throughout an hourly bucket contribute 120 discharging minutes). The monitor-minutes are the
+    overlaps of the events with the 15 minute buckets of the finest level (see `coverage_minutes`), summed into the
+    buckets of the coarser levels.
+
+    Attributes:
+        water_company: The Water Company whose network the timeseries describe.
+        since: The start of the timeseries (midnight of the day it was requested from).
+        until: The time up to which the timeseries were last computed.
+        include_inactive: Whether monitors that are no longer active are included.
+        levels: A dictionary of the levels, accessed by the (pandas) frequency of their buckets.
+
+    Methods:
+        extend: Extend the levels with the history that has arrived since they were last computed.
+        query: Return the finest level that covers a window in at most a given number of buckets.
+    """
+
+    LEVELS = ["15min", "1h", "1D"]
+    COUNT_COLUMNS = [
+        "number_discharging",
+        "number_recently_discharging",
+        "number_online",
+    ]
+    MINUTE_COLUMNS = [
+        "discharging_minutes",
+        "recently_discharging_minutes",
+        "online_minutes",
+    ]
+
+    def __init__(
+        self,
+        water_company: "WaterCompany",
+        since: datetime.datetime,
+        include_inactive: bool = True,
+    ) -> None:
+        """
+        Compute the levels of the timeseries of a Water Company network since the given datetime.
+
+        Args:
+            water_company: The Water Company, whose histories must be set (see `WaterCompany.set_all_histories`).
+            since: The datetime to start the timeseries from, which is rounded down to midnight.
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+        """
+        self._water_company = water_company
+        self._since: pd.Timestamp = pd.Timestamp(since).floor("1D")
+        self._include_inactive = include_inactive
+        self._levels: Dict[str, pd.DataFrame] = self._compute(self._since)
+
+    @property
+    def water_company(self) -> "WaterCompany":
+        """Return the Water Company whose network the timeseries describe."""
+        return self._water_company
+
+    @property
+    def since(self) -> pd.Timestamp:
+        """Return the start of the timeseries."""
+        return self._since
+
+    @property
+    def until(self) -> pd.Timestamp:
+        """Return the time up to which the timeseries were last computed."""
+        return self._until
+
+    @property
+    def include_inactive(self) -> bool:
+        """Return whether monitors that are no longer active are included."""
+        return self._include_inactive
+
+    @property
+    def levels(self) -> Dict[str, pd.DataFrame]:
+        """Return the levels of the timeseries, accessed by the (pandas) frequency of their buckets."""
+        return self._levels
+
+    def _compute(self, since: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        """
+        Compute the levels of the timeseries from the given midnight until now, recording the earliest time from
+        which they may change as new history arrives: the start of the earliest discharge or offline event that is
+        still ongoing, or the newest alert already ingested (the end of the newest complete event), if earlier.
+        """
+        self._until = pd.Timestamp(datetime.datetime.now())
+        levels = {}
+        for level in self.LEVELS:
+            df = self._water_company.get_monitor_timeseries(
+                since,
+                include_inactive=self._include_inactive,
+                step=pd.Timedelta(level).to_pytimedelta(),
+                until=self._until,
+            ).set_index("datetime")
+            df.index = pd.DatetimeIndex(df.index, name="datetime")
+            levels[level] = df
+        columns, _ = self._water_company._network_history(
+            include_inactive=self._include_inactive
+        )
+        fine = levels[self.LEVELS[0]]
+        minutes = self._monitor_minutes(columns, since, len(fine))
+        for column in self.MINUTE_COLUMNS:
+            fine[column] = minutes[column]
+        for level in self.LEVELS[1:]:
+            levels[level] = levels[level].join(
+                fine[self.MINUTE_COLUMNS].resample(level).sum()
+            )
+
+        ongoing = columns.ongoing
+        mutable = [self._until]
+        if (~ongoing).any():
+            mutable.append(from_epoch(columns.end[~ongoing].max()))
+        # Ongoing periods of no discharge only end when a new alert arrives, so do not change the past
+        open_events = ongoing & (
+            columns.event_type != EVENT_TYPE_CODES["Not Discharging"]
+        )
+        if open_events.any():
+            mutable.append(from_epoch(columns.start[open_events].min()))
+        self._mutable_since = min(mutable)
+        return levels
+
+    def _monitor_minutes(
+        self, columns: EventColumns, since: pd.Timestamp, length: int
+    ) -> Dict[str, np.ndarray]:
+        """
+        Return the monitor-minutes that monitors were discharging, recently discharging and online in each of the
+        15 minute buckets from the given midnight, with ongoing events ending when the levels were computed. As in
+        `WaterCompany.get_monitor_timeseries`, monitors are online from their first event, except while offline (and,
+        for monitors that are no longer active, after their last event).
+        """
+        origin = int(to_epoch(since))
+        now = int(to_epoch(self._until))
+        ongoing = columns.ongoing
+        end = np.minimum(np.where(ongoing, now, columns.end), now)
+        monitor = columns.monitor
+        discharging = columns.event_type == EVENT_TYPE_CODES["Discharging"]
+        offline = columns.event_type == EVENT_TYPE_CODES["Offline"]
+
+        def _minutes(
+            monitor: np.ndarray, start: np.ndarray, end: np.ndarray
+        ) -> np.ndarray:
+            return coverage_minutes(monitor, start, end, origin, length)
+
+        minutes = {
+            "discharging_minutes": _minutes(
+                monitor[discharging], columns.start[discharging], end[discharging]
+            ),
+            # Monitors are recently active until 48 hours after the end of a discharge
+            "recently_discharging_minutes": _minutes(
+                monitor[discharging],
+                columns.start[discharging],
+                np.minimum(end[discharging] + 48 * 3600, now),
+            ),
+        }
+        has_events = np.diff(columns.offsets) > 0
+        first = columns.start[columns.offsets[:-1][has_events]]
+        online = _minutes(np.flatnonzero(has_events), first, np.full(len(first), now))
+        offline_monitor = monitor[offline]
+        offline_start = columns.start[offline]
+        offline_end = end[offline]
+        n_monitors = len(columns.monitor_names)
+        n_active = len(self._water_company.active_monitors)
+        if n_monitors > n_active:
+            inactive = np.arange(n_active, n_monitors)[has_events[n_active:]]
+            last = columns.offsets[inactive + 1] - 1
+            closed = ~ongoing[last]
+            offline_monitor = np.concatenate((offline_monitor, inactive[closed]))
+            offline_start = np.concatenate((offline_start, end[last[closed]]))
+            offline_end = np.concatenate((offline_end, np.full(closed.sum(), now)))
+        online -= _minutes(offline_monitor, offline_start, offline_end)
+        minutes["online_minutes"] = online
+        return minutes
+
+    def extend(self) -> None:
+        """
+        Extend the levels with the history that has arrived since they were last computed (e.g., after
+        `WaterCompany.set_all_histories`). Only the days from the earliest time from which the levels may have changed
+        (see `_compute`) are recomputed, as histories are only appended to (or their ongoing events ended) by new
+        alerts.
+        """
+        since = max(min(self._mutable_since, self._until).floor("1D"), self._since)
+        print("\033[36m" + f"Extending timeseries pyramid from {since}" + "\033[0m")
+        levels = self._compute(since)
+        for level, df in levels.items():
+            kept = self._levels[level]
+            self._levels[level] = pd.concat([kept[kept.index < since], df])
+
+    def query(
+        self,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        max_buckets: int = 2000,
+    ) -> pd.DataFrame:
+        """
+        Return the rows of the finest level that covers the window [since, until) in at most the given number of
+        buckets (or of the coarsest level, if none do), e.g., for a chart zoomed to the window.
+
+        Args:
+            since: The start of the window. Defaults to None, the start of the timeseries.
+            until: The end of the window. Defaults to None, the time up to which the timeseries were last computed.
+            max_buckets: The maximum number of buckets to return. Defaults to 2000.
+
+        Returns:
+            A dataframe of the buckets of the level within the window.
+        """
+        since = self._since if since is None else pd.Timestamp(since)
+        until = self._until if until is None else pd.Timestamp(until)
+        for level in self.LEVELS:
+            df = self._levels[level]
+            window = df[(df.index >= since) & (df.index < until)]
+            if len(window) <= max_buckets:
+                break
+        return window
+
+
+class DischargeCube:
+    """A class to store the minutes that each monitor of a Water Company network discharged (and was offline) on each
+    day, as dense float32 matrices of monitors x days. Totals over any range of days are O(1) per monitor, from
+    cumulative sums over days, and can be rolled up over sets of monitors (e.g., by receiving watercourse). Cubes can
+    be saved to (and loaded from) disk, so they need only be rebuilt when the histories change.
+
+    Days are calendar days (of the naive datetimes of the histories), from the day of the first event to the day the
+    cube was built. Ongoing events are counted until the time the cube was built.
+
+    Attributes:
+        monitors: A table of the attributes of the monitors, in the order of the rows of the matrices.
+        days: The days of the columns of the matrices.
+        discharge: The minutes each monitor discharged on each day.
+        offline: The minutes each monitor was offline on each day.
+        include_inactive: Whether monitors that were no longer active when the cube was built are included.
+        path: The path the cube was saved to (or loaded from), or None.
+
+    Methods:
+        from_columns: Build the cube from the histories of monitors as columns (see `EventColumns`).
+        save: Save the cube to disk.
+        load: Load a cube from disk.
+        total: Return the total minutes of each monitor over a range of days.
+        by_watercourse: Return the total minutes over a range of days summed over the monitors of each watercourse.
+    """
+
+    def __init__(
+        self,
+        monitors: pd.DataFrame,
+        days: pd.DatetimeIndex,
+        discharge: np.ndarray,
+        offline: np.ndarray,
+        include_inactive: bool = True,
+        path: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            monitors: A table of the attributes of the monitors (see `MONITOR_ATTRIBUTE_COLUMNS`).
+            days: The days of the columns of the matrices.
+            discharge: The minutes each monitor discharged on each day (monitors x days).
+            offline: The minutes each monitor was offline on each day (monitors x days).
+            include_inactive: Whether monitors that are no longer active are included. Defaults to True.
+            path: The path the cube was saved to (or loaded from). Defaults to None.
+        """
+        shape = (len(monitors), len(days))
+        if discharge.shape != shape or offline.shape != shape:
+            raise ValueError(
+                "The matrices must have one row per monitor and one column per day."
+            )
+        self._monitors = monitors.reset_index(drop=True)
+        self._days = pd.DatetimeIndex(days)
+        self._discharge = discharge.astype(np.float32, copy=False)
+        self._offline = offline.astype(np.float32, copy=False)
+        self._include_inactive = include_inactive
+        self._path = path
+        self._cumulative_cache: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: EventColumns,
+        monitors: pd.DataFrame,
+        now: Optional[float] = None,
+        include_inactive: bool = True,
+    ) -> "DischargeCube":
+        """
+        Build the cube from the histories of monitors as columns. Each event is split between the days it spans in
+        one vectorised pass over all events.
+
+        Args:
+            columns: The histories of the monitors as columns (see `EventColumns`).
+            monitors: A table of the attributes of the monitors, in the order of their blocks of rows in the columns.
+            now: The time (seconds since the epoch) at which ongoing events end. Defaults to None, the current time.
+            include_inactive: Whether the monitors include those that are no longer active. Defaults to True.
+
+        Returns:
+            The cube.
+        """
+        if now is None:
+            now = to_epoch(datetime.datetime.now())
+        first = min(columns.start.min(), now) if len(columns) > 0 else now
+        first_day = int(first // 86400)
+        n_days = int(now // 86400) - first_day + 1
+        origin = first_day * 86400
+        # Times in minutes since midnight of the first day, clipped to now (as in `Monitor.total_discharge`)
+        start = (np.minimum(columns.start, now) - origin) / 60
+        end = (np.minimum(columns.end_or_now(now), now) - origin) / 60
+        matrices = {}
+        for kind in ["Discharging", "Offline"]:
+            rows = columns.event_type == EVENT_TYPE_CODES[kind]
+            matrices[kind] = _bucket_minutes(
+                columns.monitor[rows],
+                start[rows],
+                end[rows],
+                len(columns.monitor_names),
+                n_days,
+            ).astype(np.float32)
+        days = pd.to_datetime(np.arange(first_day, first_day + n_days), unit="D")
+        return cls(
+            monitors,
+            days,
+            matrices["Discharging"],
+            matrices["Offline"],
+            include_inactive=include_inactive,
+        )
+
+    @property
+    def monitors(self) -> pd.DataFrame:
+        """Return a table of the attributes of the monitors, in the order of the rows of the matrices."""
+        return self._monitors
+
+    @property
+    def days(self) -> pd.DatetimeIndex:
+        """Return the days of the columns of the matrices."""
+        return self._days
+
+    @property
+    def discharge(self) -> np.ndarray:
+        """Return the minutes each monitor discharged on each day."""
+        return self._discharge
+
+    @property
+    def offline(self) -> np.ndarray:
+        """Return the minutes each monitor was offline on each day."""
+        return self._offline
+
+    @property
+    def include_inactive(self) -> bool:
+        """Return whether monitors that are no longer active are included."""
+        return self._include_inactive
+
+    @property
+    def path(self) -> Optional[str]:
+        """Return the path the cube was saved to (or loaded from), or None."""
+        return self._path
+
+    def save(self, path: str) -> None:
+        """
+        Save the cube to disk (as a compressed numpy .npz file).
+
+        Args:
+            path: The path to save the cube to. The .npz extension is added if it is missing (as numpy does).
+        """
+        path = _npz_path(path)
+        np.savez_compressed(
+            path,
+            days=self._days.as_unit("s").asi8,
+            discharge=self._discharge,
+            offline=self._offline,
+            include_inactive=self._include_inactive,
+            **{
+                column: self._monitors[column].to_numpy(
+                    dtype=float if column in ("X", "Y") else str
+                )
+                for column in MONITOR_ATTRIBUTE_COLUMNS
+            },
+        )
+        self._path = path
+
+    @classmethod
+    def load(cls, path: str) -> "DischargeCube":
+        """
+        Load a cube saved to disk by `save`.
+
+        Args:
+            path: The path the cube was saved to, with or without the .npz extension.
+
+        Returns:
+            The cube.
+        """
+        path = _npz_path(path)
+        with np.load(path) as data:
+            return cls(
+                pd.DataFrame(
+                    {column: data[column] for column in MONITOR_ATTRIBUTE_COLUMNS}
+                ),
+                pd.to_datetime(data["days"], unit="s"),
+                data["discharge"],
+                data["offline"],
+                include_inactive=bool(data["include_inactive"]),
+                path=path,
+            )
+
+    def _cumulative(self, kind: str) -> np.ndarray:
+        """
+        Return the cumulative sums over days of the minutes of a kind ("discharge" or "offline"), with a leading
+        column of zeros, so the total over days [i, j) is `cumulative[:, j] - cumulative[:, i]`. The sums are
+        accumulated in float64 (so they are exact) on first use and cached.
+        """
+        if kind not in self._cumulative_cache:
+            minutes = self._discharge if kind == "discharge" else self._offline
+            cumulative = np.zeros((minutes.shape[0], minutes.shape[1] + 1))
+            np.cumsum(minutes, axis=1, dtype=np.float64, out=cumulative[:, 1:])
+            self._cumulative_cache[kind] = cumulative
+        return self._cumulative_cache[kind]
+
+    def total(
+        self,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        monitors: Optional[List[str]] = None,
+        offline: bool = False,
+    ) -> pd.Series:
+        """
+        Return the total minutes that each monitor discharged (or was offline) over a range of days.
+
+        Args:
+            since: The first day of the range. Defaults to None, the first day of the cube.
+            until: The day after the last day of the range (i.e., the range is [since, until)). Defaults to None, the
+                day after the last day of the cube.
+            monitors: The names of the monitors to return. Defaults to None, all monitors.
+            offline: Whether to return the minutes offline rather than discharging. Defaults to False.
+
+        Returns:
+            A series of the total minutes of each monitor, indexed by LocationName.
+
+        Raises:
+            KeyError: If any of the monitors are not in the cube.
+        """
+        cumulative = self._cumulative("offline" if offline else "discharge")
+        first = (
+            0
+            if since is None
+            else self._days.searchsorted(pd.Timestamp(since).floor("1D"))
+        )
+        last = (
+            len(self._days)
+            if until is None
+            else self._days.searchsorted(pd.Timestamp(until).floor("1D"))
+        )
+        last = max(first, last)
+        names = self._monitors["LocationName"]
+        if monitors is None:
+            rows = np.arange(len(names))
+        else:
+            rows = pd.Index(names).get_indexer(monitors)
+            if (rows < 0).any():
+                missing = [name for name, row in zip(monitors, rows) if row < 0]
+                raise KeyError(f"Monitors not in the cube: {missing}")
+        return pd.Series(
+            cumulative[rows, last] - cumulative[rows, first],
+            index=pd.Index(names.to_numpy()[rows], name="LocationName"),
+        )
+
+    def by_watercourse(
+        self,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        offline: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Return the total minutes that the monitors of each receiving watercourse discharged (or were offline) over a
+        range of days (see `total`).
+
+        Args:
+            since: The first day of the range. Defaults to None, the first day of the cube.
+            until: The day after the last day of the range. Defaults to None, the day after the last day of the cube.
+            offline: Whether to return the minutes offline rather than discharging. Defaults to False.
+
+        Returns:
+            A dataframe indexed by ReceivingWaterCourse, giving the number of monitors and their total minutes.
+        """
+        totals = self.total(since=since, until=until, offline=offline)
+        return (
+            pd.DataFrame(
+                {
+                    "ReceivingWaterCourse": self._monitors[
+                        "ReceivingWaterCourse"
+                    ].to_numpy(),
+                    "Monitors": 1,
+                    "Minutes": totals.to_numpy(),
+                }
+            )
+            .groupby("ReceivingWaterCourse")
+            .sum()
+        )
+
+
+def _npz_path(path: str) -> str:
+    """Returns the path with the .npz extension added if it is missing, as `np.savez` does when saving."""
+    path = os.fspath(path)
+    return path if path.endswith(".npz") else path + ".npz"
+
+
+def _bucket_minutes(
+    monitor: np.ndarray,
+    start: np.ndarray,
+    end: np.ndarray,
+    n_monitors: int,
+    n_buckets: int,
+    bucket: int = 1440,
+) -> np.ndarray:
+    """
+    Returns a monitors x buckets matrix of the minutes covered by intervals [start, end) (in minutes since the start
+    of the first bucket, within the buckets) in each bucket of `bucket` minutes (by default, days). The partial
+    buckets at the ends of each interval are added directly, and the whole buckets between them by scattering
+    +/-`bucket` into a difference array that is summed over buckets.
+    """
+    width = n_buckets + 1
+    start_bucket = (start // bucket).astype(np.int64)
+    end_bucket = (end // bucket).astype(np.int64)
+    one_bucket = start_bucket == end_bucket
+    flat = monitor.astype(np.int64) * width
+    minutes = np.bincount(
+        flat[one_bucket] + start_bucket[one_bucket],
+        weights=(end - start)[one_bucket],
+        minlength=n_monitors * width,
+    ).astype(np.float64)
+    spans = ~one_bucket
+    flat, start_bucket, end_bucket = flat[spans], start_bucket[spans], end_bucket[spans]
+    # The partial first and last buckets of intervals spanning several buckets
+    minutes += np.bincount(
+        flat + start_bucket,
+        weights=(start_bucket + 1) * bucket - start[spans],
+        minlength=n_monitors * width,
+    )
+    minutes += np.bincount(
+        flat + end_bucket,
+        weights=end[spans] - end_bucket * bucket,
+        minlength=n_monitors * width,
+    )
+    # The whole buckets in between
+    whole_buckets = np.bincount(
+        flat + start_bucket + 1, minlength=n_monitors * width
+    ) - np.bincount(flat + end_bucket, minlength=n_monitors * width)
+    minutes = minutes.reshape(n_monitors, width)
+    minutes += bucket * np.cumsum(whole_buckets.reshape(n_monitors, width), axis=1)
+    return minutes[:, :n_buckets]
+
+
+class WaterCompany(ABC):
+    """
+    A class that represents the EDM monitoring network for a Water Company.
+
+    Attributes:
+        name: The name of the Water Company network (set by the child class).
+        timestamp: The timestamp of the last update.
+        history_timestamp: The timestamp of the last historical data update (set in the `get_history` method of the child class).
+        clientID: The client ID for the Water Company API (set by the child class).
+        clientSecret: The client secret for the Water Company API (set by the child class).
+        active_monitors: A dictionary of active monitors accessed by site name.
+        active_monitor_names: A list of the names of active monitors.
+        accumulator: The D8 flow accumulator for the region of the water company.
+        discharging_monitors: A list of all monitors that are currently recording a discharge event.
+        recently_discharging_monitors: A list of all monitors that have discharged in the last 48 hours.
+        session: The pooled HTTP session used for all requests to the Water Company API.
+        timeout: The timeout in seconds for each request to the Water Company API.
+        alert_store: The on-disk store of the alert stream of the Water Company, or None if not caching history.
+        history_columns: The histories of all active monitors as columns (see `EventColumns`).
+        anomalies: A table of the anomalies (invalid entries) found in the alert streams of monitors.
+        inactive_monitors: A table of the monitors in the alert stream that are no longer active.
+        inactive_history_columns: The histories of inactive monitors as columns (see `EventColumns`).
+        timeseries_pyramid: The multi-resolution timeseries of the network, or None if it has not been built.
+        discharge_cube: The daily discharge and offline minutes of the monitors, or None if it has not been built.
+    Methods:
+        update: Updates the active_monitors list and the timestamp, returning the changes to the network.
+        update_async: Awaitable version of update.
+        close: Close the HTTP session (releasing its pooled connections) and the alert store.
+        set_all_histories: Sets the historical data for all active monitors and store it in the history attribute of each monitor.
+        set_all_histories_async: Awaitable version of set_all_histories.
+        get_histories: Get the historical data for a list of monitors concurrently.
+        history_to_discharge_df: Convert a water company's total discharge history to a dataframe
+        discharge_summary: Summarise the discharges and offline time of every monitor over windows of time.
+        get_monitor_timeseries: Get timeseries of the number of monitors discharging, recently discharging and online.
+        build_timeseries_pyramid: Build the multi-resolution timeseries of the network, extended as history arrives.
+        build_discharge_cube: Build (and save) the daily discharge and offline minutes of the monitors.
+        annual_spill_counts: Count the spills of every monitor in each calendar year by the EA 12/24 method.
+        monitor_table: Get a table of the attributes of the monitors of the network, indexed as by monitors_overlapping.
+        monitors_overlapping: Find the monitors with events (e.g., discharges) in a window of time, or at a time.
+        get_downstream_geojson: Get a geojson of the downstream points for all active discharges in BNG coordinates.
+        get_downstream_info_geojson: Get a GeoJSON feature collection of the downstream points for all active discharges in BNG coordinates.
+        plot_current_status: Plot the current status of the Water Company network showing the downstream impact & monitor statuses.
+    """
+
+    def __init__(
+        self,
+        clientID: str,
+        clientSecret: str,
+        pool_size: int = 10,
+        timeout: float = 30.0,
+        session: Optional[requests.Session] = None,
+        columnar_history: bool = False,
+    ):
+        """
+        Initialize attributes to describe a Water Company network.
+
+        Args:
+            clientID: The client ID for the Water Company API.
+            clientSecret: The client secret for the Water Company API.
+            pool_size: The maximum number of connections kept alive in the HTTP connection pool. Defaults to 10.
+            timeout: The timeout in seconds for each request to the API. Defaults to 30.
+            session: An existing `requests.Session` to send requests through (e.g., shared between several
+                Water Companies). Defaults to None, in which case a new pooled session is created.
+            columnar_history: Whether `set_all_histories` stores histories as columns (see `EventColumns`), creating
+                Event objects only as they are accessed. Defaults to False.
+        """
+        self._name: str = None
+        self._clientID = clientID
+        self._clientSecret = clientSecret
+        self._timeout: float = timeout
+        if session is None:
+            session = self._create_session(pool_size=pool_size)
+        self._session: requests.Session = session
+        self._active_monitors: Dict[str, Monitor] = self._fetch_active_monitors()
+        self._timestamp: datetime.datetime = datetime.datetime.now()
+        self._history_timestamp: datetime.datetime = None
+        self._accumulator: D8Accumulator = None
+        self._d8_file_path: str = None
+        self._alert_store: AlertStore = None
+        self._columnar_history: bool = columnar_history
+        # The columns of each active monitor and their concatenation (see `history_columns`)
+        self._history_columns_cache: Tuple = None
+        self._anomalies: pd.DataFrame = pd.DataFrame(
+            {
+                "LocationName": pd.Categorical([]),
+                "DateTime": pd.DatetimeIndex([], dtype="datetime64[ns]"),
+                "Anomaly": pd.Categorical([]),
+            }
+        )
+        # Histories (and so anomalies) of several monitors may be set concurrently, see `get_histories`
+        self._anomalies_lock = threading.Lock()
+        # Monitors that are no longer active are not represented by Monitor objects. Their attributes and histories
+        # are archived (see `set_all_histories`) so that they can be included in network-wide statistics.
+        self._inactive_monitors: pd.DataFrame = pd.DataFrame(
+            columns=MONITOR_ATTRIBUTE_COLUMNS
+        )
+        self._inactive_history_columns: EventColumns = EventColumns.concatenate([])
+        # Extended whenever the histories are set (see `build_timeseries_pyramid`)
+        self._timeseries_pyramid: TimeseriesPyramid = None
+        # Rebuilt whenever the histories are set (see `build_discharge_cube`)
+        self._discharge_cube: DischargeCube = None
+        # The network's histories (see `_network_history`), keyed by include_inactive, and indexed for time-range
+        # queries (see `monitors_overlapping`). Cleared whenever the histories are set or the network is updated.
+        self._interval_index_cache: Dict[bool, Tuple[EventColumns, pd.DataFrame]] = {}
+
+    @abstractmethod
+    def _fetch_active_monitors(self) -> Dict[str, Monitor]:
+        """
+        Get the current status of the monitors by calling the API.
+
+        Returns:
+            A dictionary of active monitors accessed by site name.
+        """
+        pass
+
+    @abstractmethod
+    def _get_monitor_history(self, monitor: Monitor) -> List[Event]:
+        """
+        Get the history of events for a monitor.
+
+        Args:
+            monitor: The monitor for which to get the history.
+
+        Returns:
+            A list of events.
+        """
+        pass
+
+    @abstractmethod
+    def set_all_histories(self, incremental: bool = False) -> None:
+        """
+        Sets the historical data for all active monitors and store it in the history attribute of each monitor.
+
+        Args:
+            incremental: If True, only fetch alerts newer than those already ingested and update histories in place.
+        """
+        pass
+
+    def get_histories(self, monitors: List[Monitor], max_workers: int = 8) -> None:
+        """
+        Get the historical data for a list of monitors and store it in the history attribute of each monitor. The
+        histories are requested concurrently (up to `max_workers` at once) and each is stored as soon as it arrives.
+        This is much cheaper than `set_all_histories` when only a subset of monitors are of interest, and much faster
+        than calling `Monitor.get_history` for each monitor in turn.
+
+        Args:
+            monitors: The monitors for which to get the history.
+            max_workers: The maximum number of histories to request at once. Defaults to 8.
+
+        Raises:
+            Exception: If the history of any monitor could not be fetched. The histories of all other monitors are
+                still stored.
+        """
+        failed = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._get_monitor_history, monitor): monitor
+                for monitor in monitors
+            }
+            for future in as_completed(futures):
+                monitor = futures[future]
+                try:
+                    monitor._history = future.result()
+                except Exception as e:
+                    failed[monitor.site_name] = e
+        self._interval_index_cache = {}
+        if failed:
+            raise Exception(
+                "Failed to get the history of {0} monitor(s): {1}".format(
+                    len(failed), list(failed.keys())
+                )
+            ) from next(iter(failed.values()))
+
+    async def _fetch_active_monitors_async(self) -> Dict[str, Monitor]:
+        """
+        Awaitable version of `_fetch_active_monitors`. By default, this runs `_fetch_active_monitors` in a worker
+        thread so that the event loop is not blocked. Subclasses may override this to request pages concurrently.
+
+        Returns:
+            A dictionary of active monitors accessed by site name.
+        """
+        return await asyncio.to_thread(self._fetch_active_monitors)
+
+    async def _get_monitor_history_async(self, monitor: Monitor) -> List[Event]:
+        """
+        Awaitable version of `_get_monitor_history`. By default, this runs `_get_monitor_history` in a worker thread
+        so that the event loop is not blocked.
+
+        Args:
+            monitor: The monitor for which to get the history.
+
+        Returns:
+            A list of events.
+        """
+        return await asyncio.to_thread(self._get_monitor_history, monitor)
+
+    async def set_all_histories_async(self, incremental: bool = False) -> None:
+        """
+        Awaitable version of `set_all_histories`. By default, this is a non-blocking wrapper that runs
+        `set_all_histories` in a worker thread, so the event loop is not blocked but the requests themselves are made
+        one after another. Subclasses may override this to request pages concurrently.
+
+        Args:
+            incremental: If True, only fetch alerts newer than those already ingested and update histories in place.
+        """
+        await asyncio.to_thread(self.set_all_histories, incremental)
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """
+        Create a `requests.Session` with a pool of keep-alive connections, so that repeated requests to the
+        API (e.g., successive pages, or successive calls to `update`) reuse connections rather than paying
+        for a new TCP and TLS handshake each time. Responses are requested gzip-compressed.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        return session
+
+    def _fetch_d8_file(self, url: str, known_hash: str) -> str:
+        """
+        Get the path to the D8 file for the catchment. If the file is not present, it will download it from the given url.
+        This is all handled by the pooch package. The hash of the file is checked against the known hash to ensure the file is not corrupted.
+        If the file is already present in the pooch cache, it will not be downloaded again.
+        """
+        file_path = pooch.retrieve(url=url, known_hash=known_hash)
+
+        return file_path
+
+    # Define the getters for the WaterCompany class
+    @property
+    def name(self) -> str:
+        """Return the name of the Water Company network."""
+        return self._name
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """Return the timestamp of the last update."""
+        return self._timestamp
+
+    @property
+    def history_timestamp(self) -> datetime.datetime:
+        """Return the timestamp of the last historical data update."""
+        return self._history_timestamp
+
+    @property
+    def clientID(self) -> str:
+        """Return the client ID for the API."""
+        return self._clientID
+
+    @property
+    def clientSecret(self) -> str:
+        """Return the client secret for the API."""
+        return self._clientSecret
+
+    @property
+    def session(self) -> requests.Session:
+        """Return the pooled HTTP session used for requests to the API."""
+        return self._session
+
+    @property
+    def timeout(self) -> float:
+        """Return the timeout in seconds for requests to the API."""
+        return self._timeout
+
+    @property
+    def alert_store(self) -> Optional[AlertStore]:
+        """Return the on-disk store of the alert stream, or None if history is not being cached."""
+        return self._alert_store
+
+    @property
+    def history_columns(self) -> EventColumns:
+        """Return the histories of all active monitors as columns, with a block of rows per monitor in the order of
+        `active_monitors`. The columns are cached until the history of any active monitor changes.
+
+        Raises:
+            ValueError: If the history of any active monitor is not yet set.
+        """
+        columns = [
+            monitor._event_columns() for monitor in self._active_monitors.values()
+        ]
+        cache = self._history_columns_cache
+        if (
+            cache is None
+            or len(cache[0]) != len(columns)
+            or any(old is not new for old, new in zip(cache[0], columns))
+        ):
+            self._history_columns_cache = cache = (
+                columns,
+                EventColumns.concatenate(columns),
+            )
+        return cache[1]
+
+    @property
+    def inactive_monitors(self) -> pd.DataFrame:
+        """Return a table of the attributes (LocationName, PermitNumber, X, Y and ReceivingWaterCourse) of the monitors
+        in the alert stream that are no longer active, in the order of `inactive_history_columns`.
+        """
+        return self._inactive_monitors
+
+    @property
+    def inactive_history_columns(self) -> EventColumns:
+        """Return the histories of the monitors in the alert stream that are no longer active, as columns. These have
+        no current event, so all of their events are complete.
+        """
+        return self._inactive_history_columns
+
+    @property
+    def timeseries_pyramid(self) -> Optional[TimeseriesPyramid]:
+        """Return the multi-resolution timeseries of the network, or None if it has not been built."""
+        return self._timeseries_pyramid
+
+    @property
+    def discharge_cube(self) -> Optional[DischargeCube]:
+        """Return the daily discharge and offline minutes of the monitors, or None if it has not been built."""
+        return self._discharge_cube
+
+    def _network_history(
+        self, include_inactive: bool = True
+    ) -> Tuple[EventColumns, pd.DataFrame]:
+        """
+        Returns the histories of the monitors of the network as columns, and a table of the attributes of the monitors
+        (in the order of their blocks of rows in the columns).
+
+        Args:
+            include_inactive: Whether to include the archived histories of monitors that are no longer active.
+                Defaults to True.
+
+        Raises:
+            ValueError: If the history of any active monitor is not yet set.
+        """
+        monitors = self._active_monitors.values()
+        attributes = pd.DataFrame(
+            {
+                "LocationName": [monitor.site_name for monitor in monitors],
+                "PermitNumber": [monitor.permit_number for monitor in monitors],
+                "X": [monitor.x_coord for monitor in monitors],
+                "Y": [monitor.y_coord for monitor in monitors],
+                "ReceivingWaterCourse": [
+                    monitor.receiving_watercourse for monitor in monitors
+                ],
+            },
+            columns=MONITOR_ATTRIBUTE_COLUMNS,
+        )
+        columns = self.history_columns
+        if include_inactive and len(self._inactive_monitors) > 0:
+            columns = EventColumns.concatenate(
+                [columns, self._inactive_history_columns]
+            )
+            attributes = pd.concat(
+                [attributes, self._inactive_monitors], ignore_index=True
+            )
+        return columns, attributes
+
+    @property
+    def anomalies(self) -> pd.DataFrame:
+        """Return a table of the anomalies (invalid entries, which are skipped) found in the alert streams of monitors
+        when building their histories. Each row gives the LocationName of the monitor, the DateTime of the invalid
+        alert and the kind of Anomaly.
+        """
+        return self._anomalies
+
+    def _set_anomalies(
+        self, monitor_names: List[str], anomalies: pd.DataFrame
+    ) -> None:
+        """
+        Replace the anomalies recorded for monitors (e.g., once their histories are rebuilt).
+
+        Args:
+            monitor_names: The names of the monitors whose anomalies are replaced.
+            anomalies: The new anomalies of the monitors.
+        """
+        with self._anomalies_lock:
+            replaced = self._anomalies["LocationName"].isin(monitor_names)
+            kept = self._anomalies[~replaced]
+            frames = [df for df in (kept, anomalies) if not df.empty]
+            if not frames:
+                self._anomalies = kept
+                return
+            df = pd.concat(frames, ignore_index=True)
+            # Concatenating categoricals with different categories falls back to object columns
+            for column in ("LocationName", "Anomaly"):
+                df[column] = df[column].astype("category")
+            self._anomalies = df
+
+    @property
+    def active_monitors(self) -> List[Monitor]:
+        """Return the active monitors."""
+        return self._active_monitors
+
+    @property
+    def active_monitor_names(self) -> List[str]:
+        """Return the names of active monitors."""
+        return list(self._active_monitors.keys())
+
+    @property
+    def discharging_monitors(self) -> List[Monitor]:
+        """Return a list of all monitors that are currently recording a discharge event."""
+        return [
+            monitor
+            for monitor in self._active_monitors.values()
+            if monitor.current_status == "Discharging"
+        ]
+
+    @property
+    def recently_discharging_monitors(self) -> List[Monitor]:
+        """Return a list of all monitors that have discharged in the last 48 hours."""
+        return [
+            monitor
+            for monitor in self._active_monitors.values()
+            if monitor.discharge_in_last_48h
+        ]
+
+    @property
+    def accumulator(self) -> D8Accumulator:
+        """Return the D8 flow accumulator for the area of the water company.
+
+        Raises:
+            ValueError: If no D8 file is set (e.g., for a company created with `mock_api.mock_company`).
+        """
+        if self._accumulator is None:
+            if self._d8_file_path is None:
+                raise ValueError("No D8 file is set for this water company.")
+            self._accumulator = D8Accumulator(self._d8_file_path)
+        return self._accumulator
+
+    def update(self) -> Dict[str, List[Monitor]]:
+        """
+        Update the active_monitors list and the timestamp. Rather than replacing every monitor, the newly fetched
+        status of each monitor is compared to the existing monitors. Only monitors whose current event has changed
+        are modified, and existing Monitor objects (and their histories) are kept. See `_apply_update`.
+
+        Returns:
+            A dictionary of the changes to the network, accessed by the type of change. See `_apply_update`.
+        """
+        changes = self._apply_update(self._fetch_active_monitors())
+        self._timestamp = datetime.datetime.now()
+        return changes
+
+    async def update_async(self) -> Dict[str, List[Monitor]]:
+        """
+        Awaitable version of `update`. This allows a single event loop to poll several Water Companies (e.g., with
+        `asyncio.gather`) while serving other tasks.
+
+        Returns:
+            A dictionary of the changes to the network, accessed by the type of change. See `_apply_update`.
+        """
+        changes = self._apply_update(await self._fetch_active_monitors_async())
+        self._timestamp = datetime.datetime.now()
+        return changes
+
+    def _apply_update(self, fetched: Dict[str, Monitor]) -> Dict[str, List[Monitor]]:
+        """
+        Merge newly fetched monitors into the active monitors. New monitors are added and monitors that are no longer
+        reported are removed. If the histories have been set, new monitors are given a history (see
+        `_seed_history`) and the histories of removed monitors are archived with those of the other inactive monitors
+        (see `_archive_monitors`), so that network-wide statistics remain available between full syncs. Existing
+        monitors have their attributes refreshed and, if their current event has changed (i.e., a different type or
+        start time), the new event is set as their current event. If the history of such a monitor is set, the
+        previous current event is closed at the start of the new event and kept in the history (see
+        `Monitor._set_current_event`).
+
+        Args:
+            fetched: A dictionary of newly fetched monitors accessed by site name.
+
+        Returns:
+            A dictionary of the changes to the network, with keys:
+                new: Monitors that were not previously active.
+                removed: Monitors that are no longer active.
+                updated: Existing monitors whose current event has changed.
+                started_discharging: Existing monitors that have started a new discharge event.
+                stopped_discharging: Existing monitors that were discharging and no longer are.
+                went_offline: Existing monitors that have gone offline.
+                came_online: Existing monitors that were offline and no longer are.
+        """
+        changes = {
+            "new": [],
+            "removed": [],
+            "updated": [],
+            "started_discharging": [],
+            "stopped_discharging": [],
+            "went_offline": [],
+            "came_online": [],
+        }
+        histories_set = self._history_timestamp is not None
+        monitors = {}
+        for name, new_monitor in fetched.items():
+            monitor = self._active_monitors.get(name)
+            if monitor is None:
+                if histories_set:
+                    self._seed_history(new_monitor)
+                monitors[name] = new_monitor
+                changes["new"].append(new_monitor)
+                continue
+            monitors[name] = monitor
+            monitor._refresh(new_monitor)
+            old_event = monitor._current_event
+            new_event = new_monitor._current_event
+            if (
+                old_event is not None
+                and old_event.event_type == new_event.event_type
+                and old_event.start_time == new_event.start_time
+            ):
+                continue
+            # Re-attach the new event to the existing monitor
+            new_event._monitor = monitor
+            monitor._set_current_event(new_event)
+            changes["updated"].append(monitor)
+            old_type = None if old_event is None else old_event.event_type
+            if new_event.event_type == "Discharging":
+                changes["started_discharging"].append(monitor)
+            elif old_type == "Discharging":
+                changes["stopped_discharging"].append(monitor)
+            if new_event.event_type == "Offline":
+                changes["went_offline"].append(monitor)
+            elif old_type == "Offline":
+                changes["came_online"].append(monitor)
+        changes["removed"] = [
+            monitor
+            for name, monitor in self._active_monitors.items()
+            if name not in monitors
+        ]
+        if histories_set:
+            self._archive_monitors(
+                [
+                    monitor
+                    for monitor in changes["removed"]
+                    if monitor._history is not None
+                ]
+            )
+        self._active_monitors = monitors
+        self._interval_index_cache = {}
+        return changes
+
+    def _seed_history(self, monitor: Monitor) -> None:
+        """
+        Set the history of a monitor that has just become active, i.e., its current event, preceded by its archived
+        history if it was previously an inactive monitor (which is then removed from the archive).
+
+        Args:
+            monitor: The monitor that has just become active.
+        """
+        current_event = monitor.current_event
+        names = self._inactive_history_columns.monitor_names
+        if monitor.site_name not in names:
+            past = EventColumns([monitor.site_name], [], [], [], [0, 0])
+        else:
+            index = names.index(monitor.site_name)
+            past = self._inactive_history_columns.monitor_events(index)
+            kept = [i for i in range(len(names)) if i != index]
+            self._inactive_history_columns = EventColumns.concatenate(
+                [self._inactive_history_columns.monitor_events(i) for i in kept]
+            )
+            self._inactive_monitors = self._inactive_monitors.iloc[kept].reset_index(
+                drop=True
+            )
+        # The columns are oldest first, ending with the current event
+        columns = EventColumns(
+            [monitor.site_name],
+            np.append(past.start, int(to_epoch(current_event.start_time))),
+            np.append(past.end, ONGOING),
+            np.append(past.event_type, EVENT_TYPE_CODES[current_event.event_type]),
+            [0, len(past) + 1],
+        )
+        history = History(monitor, columns, {0: current_event})
+        monitor._history = history if self._columnar_history else list(history)
+
+    def _archive_monitors(self, monitors: List[Monitor]) -> None:
+        """
+        Archive the histories (as columns) and attributes of monitors that are no longer active with those of the
+        other inactive monitors (see `inactive_monitors`). Events that were ongoing are closed now.
+
+        Args:
+            monitors: The monitors that are no longer active, whose histories are set.
+        """
+        if not monitors:
+            return
+        now = int(to_epoch(datetime.datetime.now()))
+        archived = []
+        for monitor in monitors:
+            columns = monitor._event_columns()
+            end = np.where(columns.ongoing, np.maximum(columns.start, now), columns.end)
+            archived.append(
+                EventColumns(
+                    [monitor.site_name],
+                    columns.start,
+                    end,
+                    columns.event_type,
+                    [0, len(columns)],
+                )
+            )
+        self._inactive_history_columns = EventColumns.concatenate(
+            [self._inactive_history_columns] + archived
+        )
+        attributes = pd.DataFrame(
+            {
+                "LocationName": [monitor.site_name for monitor in monitors],
+                "PermitNumber": [monitor.permit_number for monitor in monitors],
+                "X": [monitor.x_coord for monitor in monitors],
+                "Y": [monitor.y_coord for monitor in monitors],
+                "ReceivingWaterCourse": [
+                    monitor.receiving_watercourse for monitor in monitors
+                ],
+            },
+            columns=MONITOR_ATTRIBUTE_COLUMNS,
+        )
+        frames = [df for df in (self._inactive_monitors, attributes) if not df.empty]
+        self._inactive_monitors = pd.concat(frames, ignore_index=True)
+
+    def close(self) -> None:
+        """
+        Close the HTTP session (releasing its pooled connections) and the alert store, if any.
+        """
+        self._session.close()
+        if self._alert_store is not None:
+            self._alert_store.close()
+
+    def _calculate_downstream_impact(
+        self, include_recent_discharges: bool = False
+    ) -> None:
+        """
+        Calculate the downstream impact for all active discharges. Stores a 2D numpy array to the WaterCompany called 'num_upstream_discharges'
+        that contains the number of upstream discharges at each point in the flow accumulator. The optional argument include_recent_discharges allows you to
+        include discharges that have occurred in the last 48 hours. Defaults to False.
+
+        This function returns None but stores the result (a 2D numpy array) in the WaterCompany object.
+
+        Args:
+            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+        """
+
+        # Extract all the xy coordinates of active discharges
+        accumulator = self.accumulator
+        # Coords of all active discharges in OSGB
+        if not include_recent_discharges:
+            source_nodes = [
+                accumulator.coord_to_node(discharge.x_coord, discharge.y_coord)
+                for discharge in self.discharging_monitors
+            ]
+        else:
+            source_nodes = [
+                accumulator.coord_to_node(discharge.x_coord, discharge.y_coord)
+                for discharge in self.recently_discharging_monitors
+            ]
+
+        # Set up the source array for propagating discharges downstream
+        source_array = np.zeros(accumulator.arr.shape).flatten()
+        source_array[source_nodes] = 1
+        source_array = source_array.reshape(accumulator.arr.shape)
+        # Propagate the discharges downstream and add the result to the WaterCompany object
+        return accumulator.accumulate(source_array)
+
+    def get_downstream_geojson(
+        self, include_recent_discharges: bool = False
+    ) -> MultiLineString:
+        """
+        Get a MultiLineString of the downstream points for all active discharges in BNG coordinates.
+
+        Args:
+            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+
+        Returns:
+            A geojson MultiLineString of the downstream points for all active (or optionally recent) discharges.
+        """
+        # Calculate the downstream impact
+        downstream_impact = self._calculate_downstream_impact(
+            include_recent_discharges=include_recent_discharges
+        )
+        # Convert the downstream impact to a geojson
+        return self._accumulator.get_channel_segments(downstream_impact, threshold=0.9)
+
+    def get_downstream_info_geojson(
+        self, include_recent_discharges=False
+    ) -> FeatureCollection:
+        """
+        Get a GeoJSON feature collection of the downstream points for all active discharges in BNG coordinates.
+        Each feature contains as properties: 1) the number of upstream discharges 2) the number of upstream discharges
+        per km2 upstream and 3) a list of the active (or recent) discharging EDMs upstream.
+
+        Args:
+            include_recent_discharges: Whether to include discharges that have occurred in the last 48 hours. Defaults to False.
+
+        Returns:
+            A GeoJSON feature collection of the downstream points for all active (or optionally recent) discharges.
+        """
+        trsfm = self.accumulator.ds.GetGeoTransform()
+        cell_area = (trsfm[1] * trsfm[5] * -1) / 1000000
+        areas = np.ones(self.accumulator.arr.shape) * cell_area
+        drainage_area = self.accumulator.accumulate(areas)
+        impact = self._calculate_downstream_impact(
+            include_recent_discharges=include_recent_discharges
+        )
+        impact_per_area = impact / drainage_area
+        impact = impact.flatten()
+        impact_per_area = impact_per_area.flatten()
+        dstream_nodes = np.where(impact > 0)[0]
+
+        # Create a dictionary of properties for each node
+        dstream_info = {
+            node: {
+                "number_upstream_CSOs": impact[node],
+                "number_CSOs_per_km2": impact_per_area[node],
+                "CSOs": [],
+            }
+            for node in dstream_nodes
+        }
+        if include_recent_discharges:
+            sources = self.recently_discharging_monitors
+        else:
+            sources = self.discharging_monitors
+
+        # Add the sources for each impacted node to the dictionary of properties
+        for monitor in sources:
+            node = self.accumulator.coord_to_node(monitor.x_coord, monitor.y_coord)
             dstream, _ = self.accumulator.get_profile(node)
             for node in dstream:
                 dstream_info[node]["CSOs"].append(monitor.site_name)
@@ -803,7 +2342,11 @@ class WaterCompany(ABC):
         return feature_collection
 
     def get_monitor_timeseries(
-        self, since: datetime.datetime
+        self,
+        since: datetime.datetime,
+        include_inactive: bool = True,
+        step: datetime.timedelta = datetime.timedelta(minutes=15),
+        until: Optional[datetime.datetime] = None,
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Returns a pandas DataFrame containing timeseries of the number of CSOs that 1) were active, 2) were active in last
@@ -813,30 +2356,99 @@ class WaterCompany(ABC):
         'notdischarging' for a month until its first discharge event, it will be counted as offline for that month. Lacking
         any other information, this is the most conservative assumption we can make.
 
+        Monitors that are no longer active are included (unless `include_inactive` is False) from their archived
+        histories, and are counted as offline after their last recorded event.
+
+        The counts are computed for all monitors at once by a sweep over the times: the intervals of times (see
+        `history_masks`) in which each monitor was discharging, recently discharging and offline are merged per
+        monitor, +1/-1 are scattered at their boundaries and the counts are the cumulative sum. Events are rounded out
+        to the steps they cover, so (for times on multiples of the step, e.g., since midnight) a monitor is counted at
+        a time if it was, e.g., discharging at any point in the step that starts at that time.
+
         Args:
             since: The datetime to start the timeseries from.
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+            step: The step between the times of the timeseries, from 5 minutes to 1 day, which must divide a day
+                evenly. Defaults to 15 minutes.
+            until: The datetime to end the timeseries at (exclusive). Defaults to None, i.e., now.
 
         Returns:
             A pandas DataFrame containing timeseries of the number of CSOs that 1) were active, 2) were active in last
-            48 hours, 3) online at a list of times every 15 minutes since the given datetime.
-        """
-        times = []
-        now = datetime.datetime.now()
-        time = since
-        while time < now:
-            times.append(time)
-            time += datetime.timedelta(minutes=15)
+            48 hours, 3) online at a list of times every step since the given datetime.
 
-        active = np.zeros(len(times), dtype=int)
-        recent = np.zeros(len(times), dtype=int)
-        online = np.zeros(len(times), dtype=int)
+        Raises:
+            ValueError: If the step is not between 5 minutes and 1 day, or does not divide a day evenly.
+        """
+        if not (
+            datetime.timedelta(minutes=5) <= step <= datetime.timedelta(days=1)
+            and datetime.timedelta(days=1) % step == datetime.timedelta(0)
+        ):
+            raise ValueError(
+                "The step must be between 5 minutes and 1 day, and divide a day evenly."
+            )
+        if until is None:
+            until = datetime.datetime.now()
+        step = np.timedelta64(step)
+        times = np.arange(
+            np.datetime64(pd.Timestamp(since).to_pydatetime(), "us"),
+            np.datetime64(pd.Timestamp(until).to_pydatetime(), "us"),
+            step,
+        )
+        length = len(times)
+        print("\033[36m" + f"Building monitor timeseries" + "\033[0m")
+        columns, monitors = self._network_history(include_inactive=include_inactive)
+        n_monitors = len(columns.monitor_names)
+        monitor = columns.monitor
+        ongoing = columns.ongoing
+        start = round_times_down(columns.start, step)
+        end = round_times_down(np.where(ongoing, columns.start, columns.end), step)
+        end += step
+        start_position = grid_positions(start, times, step)
+        end_position = np.where(ongoing, length, grid_positions(end, times, step))
+        # Monitors are recently active until 48 hours after the end of a discharge
+        recent_position = np.where(
+            ongoing,
+            length,
+            grid_positions(end + np.timedelta64(48, "h"), times, step),
+        )
+        discharging = columns.event_type == EVENT_TYPE_CODES["Discharging"]
+        offline = columns.event_type == EVENT_TYPE_CODES["Offline"]
+
+        active = coverage_counts(
+            monitor[discharging],
+            start_position[discharging],
+            end_position[discharging],
+            length,
+        )
+        recent = coverage_counts(
+            monitor[discharging],
+            start_position[discharging],
+            recent_position[discharging],
+            length,
+        )
 
-        for monitor in self.active_monitors.values():
-            print(f"Processing {monitor.site_name}")
-            mon_online, mon_active, mon_recent = monitor._history_masks(times)
-            active += mon_active.astype(int)
-            recent += mon_recent.astype(int)
-            online += mon_online.astype(int)
+        # Monitors are online from their first event, except while offline (and, for monitors that are no longer
+        # active, after their last event)
+        has_events = np.diff(columns.offsets) > 0
+        first_position = start_position[columns.offsets[:-1][has_events]]
+        online = np.cumsum(np.bincount(first_position, minlength=length + 1)[:length])
+        offline_monitor = monitor[offline]
+        offline_start = start_position[offline]
+        offline_end = end_position[offline]
+        n_active = len(self._active_monitors)
+        if n_monitors > n_active:
+            inactive = np.arange(n_active, n_monitors)[has_events[n_active:]]
+            last = columns.offsets[inactive + 1] - 1
+            closed = ~ongoing[last]
+            last_end = round_times_down(columns.end[last[closed]], step) + step
+            offline_monitor = np.concatenate((offline_monitor, inactive[closed]))
+            offline_start = np.concatenate(
+                (offline_start, grid_positions(last_end, times, step))
+            )
+            offline_end = np.concatenate(
+                (offline_end, np.full(closed.sum(), length))
+            )
+        online -= coverage_counts(offline_monitor, offline_start, offline_end, length)
 
         return pd.DataFrame(
             {
@@ -847,6 +2459,275 @@ class WaterCompany(ABC):
             }
         )
 
+    def _interval_index(
+        self, include_inactive: bool = True
+    ) -> Tuple[EventColumns, pd.DataFrame]:
+        """
+        Returns the histories of the monitors of the network as columns, and a table of their attributes (see
+        `_network_history`), cached so that the columns (and their start time indexes) are only built once per change
+        to the histories.
+        """
+        if include_inactive not in self._interval_index_cache:
+            self._interval_index_cache[include_inactive] = self._network_history(
+                include_inactive=include_inactive
+            )
+        return self._interval_index_cache[include_inactive]
+
+    def monitor_table(self, include_inactive: bool = True) -> pd.DataFrame:
+        """
+        Returns a table of the attributes of the monitors of the network, whose rows are the monitor indices returned
+        by `monitors_overlapping`: the active monitors (in the order of `active_monitors`) and then, unless
+        `include_inactive` is False, the monitors that are no longer active.
+
+        Args:
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+
+        Returns:
+            A dataframe of the attributes of the monitors.
+        """
+        return self._interval_index(include_inactive)[1]
+
+    def monitors_overlapping(
+        self,
+        since: datetime.datetime,
+        until: Optional[datetime.datetime] = None,
+        event_type: Optional[str] = "Discharging",
+        include_inactive: bool = True,
+    ) -> np.ndarray:
+        """
+        Returns the monitors that had an event of the given type (by default, a discharge) at any point in the window
+        [since, until), or ongoing at since if until is not given. The events of all monitors are indexed together by
+        start time, with the running maximum of their end times (see `EventColumns.overlapping`), so each query is a
+        pair of binary searches rather than a scan of the histories. The index is built on the first query after the
+        histories are set or the network is updated.
+
+        Args:
+            since: The start of the window (or the time, if until is not given).
+            until: The end of the window. Defaults to None.
+            event_type: The type of the events ("Discharging", "Offline" or "Not Discharging"). Defaults to
+                "Discharging". If None, events of any type are found.
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+
+        Returns:
+            The indices of the monitors, i.e., their rows in `monitor_table`, in increasing order.
+
+        Raises:
+            ValueError: If the history is not yet set. Run set_all_histories() first.
+        """
+        if self.history_timestamp is None:
+            raise ValueError(
+                "History may not yet be set. Try running set_all_histories() first."
+            )
+        columns, _ = self._interval_index(include_inactive)
+        rows = columns.overlapping(
+            to_epoch(since),
+            None if until is None else to_epoch(until),
+            event_type=None if event_type is None else EVENT_TYPE_CODES[event_type],
+        )
+        return np.unique(columns.monitor[rows])
+
+    def build_timeseries_pyramid(
+        self, since: datetime.datetime, include_inactive: bool = True
+    ) -> TimeseriesPyramid:
+        """
+        Build the timeseries of the number of monitors discharging, recently discharging and online at resolutions of
+        15 minutes, 1 hour and 1 day (see `TimeseriesPyramid`). The pyramid is stored in `timeseries_pyramid`, and
+        extended incrementally whenever the histories are set, rather than recomputed.
+
+        Args:
+            since: The datetime to start the timeseries from, which is rounded down to midnight.
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+
+        Returns:
+            The timeseries pyramid.
+
+        Raises:
+            ValueError: If the history is not yet set. Run set_all_histories() first.
+        """
+        if self.history_timestamp is None:
+            raise ValueError(
+                "History may not yet be set. Try running set_all_histories() first."
+            )
+        print("\033[36m" + f"Building timeseries pyramid" + "\033[0m")
+        self._timeseries_pyramid = TimeseriesPyramid(
+            self, since, include_inactive=include_inactive
+        )
+        return self._timeseries_pyramid
+
+    def build_discharge_cube(
+        self, include_inactive: bool = True, path: Optional[str] = None
+    ) -> DischargeCube:
+        """
+        Build the minutes that each monitor discharged (and was offline) on each day as dense monitors x days
+        matrices (see `DischargeCube`), and save them to disk. The cube is stored in `discharge_cube`, and rebuilt (and
+        saved) whenever the histories are set.
+
+        Args:
+            include_inactive: Whether to include monitors that are no longer active. Defaults to True.
+            path: The path to save the cube to. Defaults to None, in which case it is saved in the pooch cache
+                directory.
+
+        Returns:
+            The discharge cube.
+
+        Raises:
+            ValueError: If the history is not yet set. Run set_all_histories() first.
+        """
+        if self.history_timestamp is None:
+            raise ValueError(
+                "History may not yet be set. Try running set_all_histories() first."
+            )
+        print("\033[36m" + f"Building discharge cube" + "\033[0m")
+        if path is None:
+            path = os.path.join(cache_dir(), f"{self.name}_discharge_cube.npz")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns, monitors = self._network_history(include_inactive=include_inactive)
+        self._discharge_cube = DischargeCube.from_columns(
+            columns, monitors, include_inactive=include_inactive
+        )
+        self._discharge_cube.save(path)
+        return self._discharge_cube
+
+    def annual_spill_counts(self, include_inactive: bool = True) -> pd.DataFrame:
+        """
+        Returns the number of spills of every monitor in each calendar year, counted by the Environment Agency 12/24
+        method (see `spill_blocks_12_24`) as in regulatory annual returns. The spills of all monitors are counted in
+        one pass over the discharges of the network (see `EventColumns`). Each block is counted in the year in which it
+        starts, and ongoing discharges are counted until now.
+
+        Args:
+            include_inactive: Whether to include monitors that are no longer active (from their archived histories).
+                Defaults to True.
+
+        Returns:
+            A dataframe with one row per monitor per year (from the year of the first discharge of the network to the
+            current year), giving the attributes of the monitor, the Year and the SpillCount.
+
+        Raises:
+            ValueError: If the history is not yet set. Run set_all_histories() first.
+        """
+        if self.history_timestamp is None:
+            raise ValueError(
+                "History may not yet be set. Try running set_all_histories() first."
+            )
+        print("\033[36m" + f"Counting spills (12/24 method)" + "\033[0m")
+        columns, monitors = self._network_history(include_inactive=include_inactive)
+        now = datetime.datetime.now()
+        # Discharges are counted until now, as in `Monitor.total_discharge`
+        discharging = (columns.event_type == EVENT_TYPE_CODES["Discharging"]) & (
+            columns.start <= to_epoch(now)
+        )
+        end = np.minimum(columns.end_or_now(to_epoch(now)), to_epoch(now))
+        end = end.astype(np.int64)
+        monitor, anchor, last = spill_blocks_12_24(
+            columns.monitor[discharging], columns.start[discharging], end[discharging]
+        )
+        first_year = (
+            from_epoch(anchor.min()).year if len(anchor) > 0 else now.year
+        )
+        years = np.arange(first_year, now.year + 1)
+        edges = to_epoch_array(
+            [datetime.datetime(year, 1, 1) for year in range(first_year, now.year + 2)]
+        ).astype(np.int64)
+        # The number of blocks of each sequence that start before each year boundary
+        before = np.where(
+            edges[None, :] <= anchor[:, None],
+            0,
+            1
+            + np.clip(
+                -((anchor[:, None] + 12 * 3600 - edges[None, :]) // (24 * 3600)),
+                0,
+                last[:, None],
+            ),
+        )
+        spills = np.zeros((len(monitors), len(years)), dtype=np.int64)
+        np.add.at(spills, monitor, np.diff(before, axis=1))
+
+        df = monitors.iloc[np.repeat(np.arange(len(monitors)), len(years))]
+        df = df.reset_index(drop=True)
+        df["Year"] = np.tile(years, len(monitors))
+        df["SpillCount"] = spills.ravel()
+        return df
+
+    def discharge_summary(
+        self,
+        windows: Optional[
+            Dict[str, Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]]
+        ] = None,
+        include_inactive: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Returns a table summarising the discharges (and offline time) of every monitor in the network over windows of
+        time, computed in one vectorised pass over the histories of all monitors (see `EventColumns`) rather than by
+        calling `Monitor.total_discharge` for each monitor and window.
+
+        For each window `name`, the table has the columns:
+            {name}DischargeMinutes: The total discharge in minutes within the window (as `Monitor.total_discharge`).
+            {name}DischargeCount: The number of discharges that overlap the window.
+            {name}LongestDischarge: The duration in minutes of the longest discharge that overlaps the window (the
+                whole discharge, not just the part within the window), or 0 if there are none.
+            {name}OfflineMinutes: The total time in minutes that the monitor was offline within the window.
+
+        Args:
+            windows: A dictionary of windows, mapping the name of each window to a tuple of its since and until
+                datetimes. A since of None means since records began and an until of None means until now. Defaults
+                to None, in which case the last 6 months (183 days), last 12 months (365 days) and since the start of
+                the year are used (named Last6Months, Last12Months and SinceStartOfYear).
+            include_inactive: Whether to include monitors that are no longer active (from their archived histories).
+                Defaults to True.
+
+        Returns:
+            A dataframe with one row per monitor, giving the attributes of the monitor and its summary in each window.
+
+        Raises:
+            ValueError: If the history is not yet set. Run set_all_histories() first.
+        """
+        if self.history_timestamp is None:
+            raise ValueError(
+                "History may not yet be set. Try running set_all_histories() first."
+            )
+        now = datetime.datetime.now()
+        if windows is None:
+            windows = {
+                "Last6Months": (now - datetime.timedelta(days=183), None),
+                "Last12Months": (now - datetime.timedelta(days=365), None),
+                "SinceStartOfYear": (datetime.datetime(now.year, 1, 1), None),
+            }
+        print("\033[36m" + f"Building discharge summary table" + "\033[0m")
+        columns, monitors = self._network_history(include_inactive=include_inactive)
+        n_monitors = len(columns.monitor_names)
+        now = to_epoch(now)
+        start = columns.start.astype(np.float64)
+        end = columns.end_or_now(now)
+        discharging = columns.event_type == EVENT_TYPE_CODES["Discharging"]
+        offline = columns.event_type == EVENT_TYPE_CODES["Offline"]
+        duration = (end - start) / 60
+
+        summary = {}
+        for name, (since, until) in windows.items():
+            since = to_epoch(datetime.datetime(2000, 1, 1) if since is None else since)
+            until = now if until is None else to_epoch(until)
+            # The time (in minutes) of each event within the window
+            overlap = np.maximum(np.minimum(end, until) - np.maximum(start, since), 0)
+            overlap /= 60
+            in_window = discharging & (overlap > 0)
+            longest = np.zeros(n_monitors)
+            np.maximum.at(longest, columns.monitor[in_window], duration[in_window])
+            summary[f"{name}DischargeMinutes"] = np.bincount(
+                columns.monitor, weights=overlap * discharging, minlength=n_monitors
+            )
+            summary[f"{name}DischargeCount"] = np.bincount(
+                columns.monitor[in_window], minlength=n_monitors
+            )
+            summary[f"{name}LongestDischarge"] = longest
+            summary[f"{name}OfflineMinutes"] = np.bincount(
+                columns.monitor, weights=overlap * offline, minlength=n_monitors
+            )
+
+        return pd.concat(
+            [monitors.reset_index(drop=True), pd.DataFrame(summary)], axis=1
+        )
+
     def plot_current_status(self) -> None:
         """
         Plot the current status of the Water Company network.
@@ -898,10 +2779,14 @@ class WaterCompany(ABC):
         plt.ylabel("Northing (m)")
         plt.title(self.name + ": " + self.timestamp.strftime("%Y-%m-%d %H:%M"))
 
-    def history_to_discharge_df(self) -> pd.DataFrame:
+    def history_to_discharge_df(self, include_inactive: bool = True) -> pd.DataFrame:
         """
         Convert a water company's discharge history to a dataframe
 
+        Args:
+            include_inactive: Whether to include the discharges of monitors that are no longer active (from their
+                archived histories). Defaults to True.
+
         Returns:
             A dataframe of discharge events.
 
@@ -914,13 +2799,29 @@ class WaterCompany(ABC):
                 "History may not yet be set. Try running set_all_histories() first."
             )
         print("\033[36m" + f"Building output data-table" + "\033[0m")
-        df = pd.DataFrame()
-        for monitor in self.active_monitors.values():
-            print("\033[36m" + f"\tProcessing {monitor.site_name}" + "\033[0m")
-            for event in monitor.history:
-                if event.event_type == "Discharging":
-                    df = pd.concat([df, event._to_row()], ignore_index=True)
-
+        columns, monitors = self._network_history(include_inactive=include_inactive)
+        (rows,) = np.nonzero(columns.event_type == EVENT_TYPE_CODES["Discharging"])
+        # Order the discharges by monitor and then newest first, as in the histories
+        rows = rows[np.lexsort((-rows, columns.monitor[rows]))]
+        monitor_index = columns.monitor[rows]
+        ongoing = columns.ongoing[rows]
+        start = columns.start[rows]
+        end = columns.end_or_now()[rows]
+
+        df = pd.DataFrame(
+            {
+                **{
+                    column: monitors[column].to_numpy()[monitor_index]
+                    for column in MONITOR_ATTRIBUTE_COLUMNS
+                },
+                "StartDateTime": pd.to_datetime(start, unit="s"),
+                "StopDateTime": pd.to_datetime(
+                    np.where(ongoing, start, columns.end[rows]), unit="s"
+                ).where(~ongoing),
+                "Duration": (end - start) / 60,
+                "OngoingDischarge": ongoing,
+            }
+        )
         df.sort_values(
             by="StartDateTime", inplace=True, ignore_index=True, ascending=False
         )
@@ -958,3 +2859,291 @@ def round_time_up_15(time: datetime.datetime) -> datetime.datetime:
         minutes = 0
         time += datetime.timedelta(hours=1)
     return datetime.datetime(time.year, time.month, time.day, time.hour, minutes, 0, 0)
+
+
+def round_times_down(times: np.ndarray, step: np.timedelta64) -> np.ndarray:
+    """
+    Rounds an array of datetime64 times down to the nearest multiple of the step (since the epoch).
+    """
+    times = np.asarray(times, dtype="datetime64[s]")
+    return times - (times - np.datetime64(0, "s")) % step
+
+
+def round_times_down_15(times: np.ndarray) -> np.ndarray:
+    """
+    Rounds an array of datetime64 times down to the nearest 15 minutes (the vectorised `round_time_down_15`).
+    """
+    return round_times_down(times, np.timedelta64(15, "m"))
+
+
+def round_times_up_15(times: np.ndarray) -> np.ndarray:
+    """
+    Rounds an array of datetime64 times up to the nearest 15 minutes (the vectorised `round_time_up_15`). As for
+    `round_time_up_15`, times that are already on a 15 minute boundary are rounded up to the next one.
+    """
+    return round_times_down_15(times) + np.timedelta64(15, "m")
+
+
+def to_datetime64_array(
+    times: Union[List[datetime.datetime], np.ndarray, pd.Series]
+) -> np.ndarray:
+    """Returns (naive) datetimes as an array of datetime64 (with a resolution of seconds)."""
+    return pd.DatetimeIndex(pd.to_datetime(times)).as_unit("s").to_numpy()
+
+
+def grid_positions(
+    times: np.ndarray, grid: np.ndarray, step: Optional[np.timedelta64] = None
+) -> np.ndarray:
+    """
+    Returns the position of the first time in a regularly spaced grid of times that is at or after each of the given
+    times (as `np.searchsorted(grid, times)`, but computed arithmetically from the spacing of the grid). Times before
+    the grid are at position 0 and times after it at position len(grid).
+
+    Args:
+        times: An array of datetime64 times.
+        grid: A regularly spaced, increasing, array of datetime64 times.
+        step: The spacing of the grid. Defaults to None, in which case it is taken from the grid (or is 15 minutes if
+            the grid has only one time).
+
+    Returns:
+        An array of positions in the grid.
+    """
+    if len(grid) == 0:
+        return np.zeros(len(times), dtype=np.int64)
+    if step is None:
+        step = grid[1] - grid[0] if len(grid) > 1 else np.timedelta64(15, "m")
+    # Ceiling division, so times between two grid times are at the position of the later one
+    positions = -((grid[0] - times) // step)
+    return np.clip(positions, 0, len(grid))
+
+
+def _coverage(starts: np.ndarray, ends: np.ndarray, length: int) -> np.ndarray:
+    """
+    Returns a boolean array of the given length that is True at the positions covered by any of the intervals of
+    positions [start, end), using a difference array.
+    """
+    delta = np.bincount(starts, minlength=length + 1) - np.bincount(
+        ends, minlength=length + 1
+    )
+    return np.cumsum(delta[:length]) > 0
+
+
+def _merge_intervals(
+    monitor: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merges the overlapping (or adjacent) intervals [start, end) of each monitor in a single pass, dropping empty
+    intervals. Returns the monitor, start and end of each merged interval, ordered by monitor then start.
+    """
+    keep = ends > starts
+    monitor, starts, ends = monitor[keep].astype(np.int64), starts[keep], ends[keep]
+    if len(starts) == 0:
+        return monitor, starts, ends
+    # Offset the intervals of each monitor so that the intervals of all monitors can be merged in a single pass
+    base = starts.min()
+    offset = monitor * (ends.max() - base + 1)
+    order = np.lexsort((starts, monitor))
+    monitor, offset = monitor[order], offset[order]
+    starts = starts[order] - base + offset
+    reach = np.maximum.accumulate(ends[order] - base + offset)
+    merged = np.ones(len(starts), dtype=bool)
+    merged[1:] = starts[1:] > reach[:-1]
+    (first,) = np.nonzero(merged)
+    last = np.append(first[1:] - 1, len(starts) - 1)
+    return (
+        monitor[first],
+        starts[first] - offset[first] + base,
+        reach[last] - offset[first] + base,
+    )
+
+
+def coverage_counts(
+    monitor: np.ndarray, starts: np.ndarray, ends: np.ndarray, length: int
+) -> np.ndarray:
+    """
+    Returns the number of distinct monitors covered at each of `length` positions by intervals of positions
+    [start, end). Overlapping intervals of the same monitor are merged first (see `_merge_intervals`), so each
+    monitor is counted at most once at each position. The counts are the cumulative sum of +1/-1 scattered at the
+    boundaries of the merged intervals, so this is O(intervals + length).
+
+    Args:
+        monitor: The index of the monitor of each interval.
+        starts: The start position of each interval.
+        ends: The end position (exclusive) of each interval, at most `length`.
+        length: The number of positions.
+
+    Returns:
+        An int array of the number of monitors covered at each position.
+    """
+    _, starts, ends = _merge_intervals(monitor, starts, ends)
+    delta = np.bincount(starts, minlength=length + 1) - np.bincount(
+        ends, minlength=length + 1
+    )
+    return np.cumsum(delta[:length])
+
+
+def coverage_minutes(
+    monitor: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    origin: int,
+    length: int,
+    bucket: int = 15,
+) -> np.ndarray:
+    """
+    Returns the monitor-minutes covered in each of `length` buckets of `bucket` minutes from `origin` by intervals
+    of time [start, end). Intervals are clipped to the buckets, so each contributes its overlap with each bucket,
+    and overlapping intervals of the same monitor are merged first (see `_merge_intervals`), so each monitor
+    contributes at most `bucket` minutes to each bucket.
+
+    Args:
+        monitor: The index of the monitor of each interval.
+        starts: The start time of each interval (int seconds since the epoch).
+        ends: The end time (exclusive) of each interval (int seconds since the epoch).
+        origin: The start time of the first bucket (int seconds since the epoch).
+        length: The number of buckets.
+        bucket: The length of the buckets in minutes. Defaults to 15.
+
+    Returns:
+        A float array of the monitor-minutes covered in each bucket.
+    """
+    horizon = origin + length * bucket * 60
+    starts = np.clip(starts, origin, horizon)
+    ends = np.clip(ends, origin, horizon)
+    monitor, starts, ends = _merge_intervals(monitor, starts, ends)
+    return _bucket_minutes(
+        np.zeros(len(monitor), dtype=np.int64),
+        (starts - origin) / 60,
+        (ends - origin) / 60,
+        1,
+        length,
+        bucket,
+    )[0]
+
+
+def spill_blocks_12_24(
+    monitor: np.ndarray, start: np.ndarray, end: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the spills of monitors counted by the Environment Agency 12/24 method from their discharges. The first
+    discharge starts a 12 hour block, which is followed by consecutive 24 hour blocks; each block in which the monitor
+    discharged counts as one spill, until a 24 hour block without a discharge ends the sequence. The next discharge
+    then starts a new 12 hour block.
+
+    The sequence of each monitor depends on the one before, so the discharges of all monitors are scanned together:
+    the i-th discharge of every monitor is processed in one vectorised step.
+
+    Args:
+        monitor: The index of the monitor of each discharge.
+        start: The start time of each discharge (int seconds since the epoch).
+        end: The end time of each discharge (int seconds since the epoch), e.g., now for ongoing discharges.
+
+    Returns:
+        A tuple of the monitor, the start time of the first block and the index of the last block (from 0) of each
+        sequence of blocks.
+    """
+    order = np.lexsort((start, monitor))
+    monitor = monitor[order].astype(np.int64)
+    start = start[order].astype(np.int64)
+    end = end[order].astype(np.int64)
+    n_monitors = monitor.max() + 1 if len(monitor) > 0 else 0
+    counts = np.bincount(monitor, minlength=n_monitors)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    first_block = 12 * 3600
+    block = 24 * 3600
+
+    # The start of the first block and the index of the last block of the current sequence of each monitor
+    anchor = np.zeros(n_monitors, dtype=np.int64)
+    last = np.full(n_monitors, -1, dtype=np.int64)
+    sequences = []
+    for rank in range(counts.max() if len(counts) > 0 else 0):
+        (monitors,) = np.nonzero(counts > rank)
+        rows = offsets[monitors] + rank
+        discharge_start, discharge_end = start[rows], end[rows]
+        monitor_anchor, monitor_last = anchor[monitors], last[monitors]
+        # The block in which the discharge starts, for the current sequence
+        start_block = np.where(
+            discharge_start < monitor_anchor + first_block,
+            0,
+            1 + (discharge_start - monitor_anchor - first_block) // block,
+        )
+        new = (monitor_last < 0) | (start_block > monitor_last + 1)
+        ended = new & (monitor_last >= 0)
+        sequences.append(
+            (monitors[ended], monitor_anchor[ended], monitor_last[ended])
+        )
+        monitor_anchor = np.where(new, discharge_start, monitor_anchor)
+        start_block = np.where(new, 0, start_block)
+        # The block in which the discharge ends (a discharge ending on a boundary does not reach the next block)
+        end_block = np.maximum(
+            -((monitor_anchor + first_block - discharge_end) // block), 0
+        )
+        anchor[monitors] = monitor_anchor
+        last[monitors] = np.maximum.reduce(
+            [np.where(new, 0, monitor_last), start_block, end_block]
+        )
+    (monitors,) = np.nonzero(last >= 0)
+    sequences.append((monitors, anchor[monitors], last[monitors]))
+    monitor, anchor, last = (np.concatenate(arrays) for arrays in zip(*sequences))
+    return monitor, anchor, last
+
+
+def history_masks(
+    columns: EventColumns,
+    times: Union[List[datetime.datetime], np.ndarray],
+    until: Optional[datetime.datetime] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns three boolean arrays that indicate, respectively, whether a monitor was online, active, or recently
+    active (within 48 hours) at each time given in the times list, from the columns of its history. The times list
+    should be regularly spaced in 15 minute intervals. The arrays are returned in the same order as the times list.
+
+    Events are rounded out to the 15 minute intervals they cover (see `round_times_down_15` and `round_times_up_15`)
+    and located in the times by arithmetic on the spacing of the times (see `grid_positions`). Events (or parts of
+    events) outside the times are clipped to them.
+
+    Args:
+        columns: The columns of the history of a single monitor (see `EventColumns`).
+        times: A list (or datetime64 array) of times to check the monitor status at.
+        until: The time after which the monitor is offline (e.g., the end of the last event of a monitor that is
+            no longer active), which is rounded up to the nearest 15 minutes. Defaults to None.
+
+    Returns:
+        A tuple of three boolean arrays indicating whether the monitor was online, active, or recently active.
+    """
+    grid = to_datetime64_array(times)
+    online = np.zeros(len(grid), dtype=bool)
+    active = np.zeros(len(grid), dtype=bool)
+    recent = np.zeros(len(grid), dtype=bool)
+    if len(columns) == 0:
+        print(f"Monitor {columns.monitor_names[0]} has no recorded events")
+        return online, active, recent
+
+    ongoing = columns.ongoing
+    start = round_times_down_15(columns.start.astype("datetime64[s]"))
+    end = round_times_up_15(
+        np.where(ongoing, columns.start, columns.end).astype("datetime64[s]")
+    )
+    start_position = grid_positions(start, grid)
+    end_position = np.where(ongoing, len(grid), grid_positions(end, grid))
+    # Monitors are recently active until 48 hours after the end of a discharge
+    recent_position = np.where(
+        ongoing, len(grid), grid_positions(end + np.timedelta64(48, "h"), grid)
+    )
+
+    # Monitors are online from their first event, except while offline
+    online[start_position[0] :] = True
+    offline = columns.event_type == EVENT_TYPE_CODES["Offline"]
+    online &= ~_coverage(start_position[offline], end_position[offline], len(grid))
+    discharging = columns.event_type == EVENT_TYPE_CODES["Discharging"]
+    active = _coverage(
+        start_position[discharging], end_position[discharging], len(grid)
+    )
+    recent = _coverage(
+        start_position[discharging], recent_position[discharging], len(grid)
+    )
+
+    if until is not None:
+        until = round_times_up_15(to_datetime64_array([until]))[0]
+        online[grid >= until] = False
+    return online, active, recent
@@ -0,0 +1,325 @@
+"""
+Module for persisting the alert streams of Water Company APIs to disk, so that the histories of monitors can be rebuilt
+when a process restarts without re-requesting the entire alert stream from the API.
+
+Alerts are stored in an SQLite database, one per Water Company, in the pooch cache directory alongside the D8 flow
+files. Each alert is stored as a JSON record, keyed by the location name, datetime and type of the alert, so appending
+alerts that are already stored is a no-op. The database records its schema version (using SQLite's `user_version`),
+the date from which the stored alert stream is valid and the root URL of the API it was fetched from. If any of these
+differs from that expected by the running code the store is invalidated, i.e., emptied and rebuilt from the API.
+
+The module also provides checkpoints for long paginated crawls of an API, so that a crawl interrupted by a failure
+can resume from the last page that was fetched successfully rather than starting again.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pooch
+
+
+def cache_dir() -> str:
+    """Returns the directory in which poopy caches files (the default pooch cache directory)."""
+    return str(pooch.os_cache("pooch"))
+
+
+def _iso_datetimes(series: pd.Series) -> pd.Series:
+    """Converts a series of datetimes (or datetime strings) to ISO 8601 strings with a resolution of seconds."""
+    return pd.to_datetime(series).dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class AlertStore:
+    """A class to persist the alert stream of a Water Company to an SQLite database on disk.
+
+    Attributes:
+        path: The path to the SQLite database.
+        synced_until: The datetime of the newest alert of the last complete sync of the whole network, or None
+            if the whole network has not yet been synced.
+
+    Methods:
+        load: Load the stored alerts (optionally only those for one monitor) as a dataframe, newest first.
+        append: Append alerts to the store, ignoring alerts that are already stored.
+        latest: Return the datetime of the newest stored alert (optionally only for one monitor).
+        clear: Delete all stored alerts.
+        close: Close the connection to the database.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(
+        self,
+        company_name: str,
+        valid_until: datetime.datetime,
+        path: Optional[str] = None,
+        api_root: Optional[str] = None,
+    ) -> None:
+        """
+        Open (creating if necessary) the alert store for a Water Company.
+
+        Args:
+            company_name: The name of the Water Company, used to name the database file.
+            valid_until: The datetime from which the alert stream of the company is valid. If the stored alerts were
+                fetched with a different value, the store is invalidated.
+            path: The path to the SQLite database. Defaults to None, in which case the database is stored in the
+                pooch cache directory.
+            api_root: The root URL of the API the alerts are fetched from. If the stored alerts were fetched from a
+                different API (e.g., a mock of the company's API), the store is invalidated. Defaults to None.
+        """
+        if path is None:
+            path = os.path.join(cache_dir(), f"{company_name}_alerts.sqlite")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._path = path
+        self._valid_until = valid_until.isoformat()
+        self._api_root = api_root
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._initialise()
+
+    def _initialise(self) -> None:
+        """
+        Create the tables of the store, invalidating any stored data with an outdated schema or validity date, or that
+        was fetched from a different API.
+        """
+        with self._lock, self._con:
+            version = self._con.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                self._con.execute("DROP TABLE IF EXISTS alerts")
+                self._con.execute("DROP TABLE IF EXISTS meta")
+                self._con.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self._con.execute(
+                """CREATE TABLE IF NOT EXISTS alerts (
+                    location_name TEXT NOT NULL,
+                    date_time TEXT NOT NULL,
+                    alert_type TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    UNIQUE (location_name, date_time, alert_type)
+                )"""
+            )
+            self._con.execute(
+                "CREATE INDEX IF NOT EXISTS alerts_by_location ON alerts (location_name, date_time)"
+            )
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            if (
+                self._get_meta("valid_until") != self._valid_until
+                or self._get_meta("api_root") != self._api_root
+            ):
+                self._con.execute("DELETE FROM alerts")
+                self._con.execute("DELETE FROM meta")
+                self._set_meta("valid_until", self._valid_until)
+                self._set_meta("api_root", self._api_root)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            self._con.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self._con.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    @property
+    def path(self) -> str:
+        """Return the path to the SQLite database."""
+        return self._path
+
+    @property
+    def synced_until(self) -> Optional[datetime.datetime]:
+        """Return the datetime of the newest alert of the last complete sync of the whole network."""
+        with self._lock:
+            value = self._get_meta("synced_until")
+        return None if value is None else datetime.datetime.fromisoformat(value)
+
+    @synced_until.setter
+    def synced_until(self, value: Optional[datetime.datetime]) -> None:
+        """Set the datetime of the newest alert of the last complete sync of the whole network."""
+        with self._lock, self._con:
+            self._set_meta(
+                "synced_until", None if value is None else pd.Timestamp(value).isoformat()
+            )
+
+    def load(self, location_name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Load the stored alerts as a dataframe in the same format as returned by the API, newest first.
+
+        Args:
+            location_name: If given, only load the alerts for the monitor with this name. Defaults to None.
+
+        Returns:
+            A dataframe of alerts.
+        """
+        query = "SELECT record FROM alerts"
+        args = ()
+        if location_name is not None:
+            query += " WHERE location_name = ?"
+            args = (location_name,)
+        # Alerts within a sync were inserted oldest first, so ties in datetime are broken newest first by rowid
+        query += " ORDER BY date_time DESC, rowid DESC"
+        with self._lock:
+            rows = self._con.execute(query, args).fetchall()
+        return pd.DataFrame.from_records([json.loads(row[0]) for row in rows])
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Append alerts (in the format returned by the API) to the store. Alerts that are already stored are ignored.
+
+        Args:
+            df: A dataframe of alerts, newest first.
+
+        Returns:
+            The number of alerts added to the store.
+        """
+        if df.empty:
+            return 0
+        # Insert oldest first, so that rowids increase with recency
+        df = df.iloc[::-1]
+        records = json.loads(df.to_json(orient="records", date_format="iso", date_unit="s"))
+        rows = zip(
+            df["LocationName"].astype(str),
+            _iso_datetimes(df["DateTime"]),
+            df["AlertType"].astype(str),
+            (json.dumps(record) for record in records),
+        )
+        with self._lock, self._con:
+            before = self._con.total_changes
+            self._con.executemany(
+                "INSERT OR IGNORE INTO alerts (location_name, date_time, alert_type, record) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            return self._con.total_changes - before
+
+    def latest(self, location_name: Optional[str] = None) -> Optional[datetime.datetime]:
+        """
+        Return the datetime of the newest stored alert, or None if there are no stored alerts.
+
+        Args:
+            location_name: If given, only consider the alerts for the monitor with this name. Defaults to None.
+        """
+        query = "SELECT MAX(date_time) FROM alerts"
+        args = ()
+        if location_name is not None:
+            query += " WHERE location_name = ?"
+            args = (location_name,)
+        with self._lock:
+            value = self._con.execute(query, args).fetchone()[0]
+        return None if value is None else datetime.datetime.fromisoformat(value)
+
+    def clear(self) -> None:
+        """Delete all stored alerts, so that the next sync re-requests the entire alert stream."""
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM alerts")
+            self._set_meta("synced_until", None)
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self._con.close()
+
+
+class CrawlCheckpoint:
+    """A class to checkpoint a paginated crawl of an API to disk, so that an interrupted crawl can be resumed.
+
+    The checkpoint is a JSON Lines file. The first line identifies the crawl (e.g., its URL and parameters) and the
+    time it was started, and each subsequent line holds the offset and records of one page fetched successfully.
+    Pages are appended as they are fetched, so checkpointing is linear in the number of records.
+
+    Methods:
+        load: Load the pages fetched so far, returning the records and the offset of the next page.
+        append: Append a page to the checkpoint.
+        clear: Delete the checkpoint.
+    """
+
+    def __init__(
+        self, path: str, key: dict, max_age: datetime.timedelta = datetime.timedelta(days=1)
+    ) -> None:
+        """
+        Args:
+            path: The path to the checkpoint file.
+            key: A JSON serialisable description of the crawl. A checkpoint is only resumed by a crawl with the same key.
+            max_age: The maximum age of a checkpoint that is resumed. Older checkpoints are discarded. Defaults to 1 day.
+        """
+        self._path = path
+        self._key = key
+        self._max_age = max_age
+
+    @property
+    def path(self) -> str:
+        """Return the path to the checkpoint file."""
+        return self._path
+
+    def load(self, offset: int) -> Tuple[List[dict], int]:
+        """
+        Load the records fetched so far by a previous, interrupted, run of the same crawl. If there is no matching
+        checkpoint, a new one is started.
+
+        Args:
+            offset: The offset of the first page of the crawl.
+
+        Returns:
+            A tuple of the records fetched so far and the offset of the next page to fetch.
+        """
+        records = []
+        next_offset = offset
+        resumable = False
+        if os.path.exists(self._path):
+            with open(self._path) as f:
+                lines = f.readlines()
+            try:
+                header = json.loads(lines[0])
+                started = datetime.datetime.fromisoformat(header["started"])
+                resumable = (
+                    header["key"] == self._key
+                    and datetime.datetime.now() - started < self._max_age
+                )
+            except (ValueError, KeyError, IndexError, TypeError):
+                # A partially written header cannot be resumed
+                pass
+            if resumable:
+                n_good = 1
+                for line in lines[1:]:
+                    try:
+                        if not line.endswith("\n"):
+                            raise ValueError("Partially written line")
+                        page = json.loads(line)
+                        items, page_offset = page["items"], page["offset"]
+                    except (ValueError, KeyError, TypeError):
+                        # A partially written (e.g., interrupted) line ends the usable checkpoint
+                        break
+                    records.extend(items)
+                    next_offset = page_offset + len(items)
+                    n_good += 1
+                if n_good < len(lines):
+                    # Truncate the checkpoint to its last good line, so that later pages are not appended after
+                    # the bad line (where every later load would ignore them)
+                    with open(self._path, "w") as f:
+                        f.writelines(lines[:n_good])
+        if not resumable:
+            records, next_offset = [], offset
+            with open(self._path, "w") as f:
+                header = {"key": self._key, "started": datetime.datetime.now().isoformat()}
+                f.write(json.dumps(header) + "\n")
+        return records, next_offset
+
+    def append(self, offset: int, items: List[dict]) -> None:
+        """
+        Append a page fetched successfully to the checkpoint.
+
+        Args:
+            offset: The offset of the page.
+            items: The records in the page.
+        """
+        with open(self._path, "a") as f:
+            f.write(json.dumps({"offset": offset, "items": items}) + "\n")
+
+    def clear(self) -> None:
+        """Delete the checkpoint, e.g., once the crawl has completed."""
+        if os.path.exists(self._path):
+            os.remove(self._path)